@@ -0,0 +1,324 @@
+"""Offline end-to-end latency, throughput and memory of the backend at several catalog sizes.
+
+Run from backend/ after building furniture.db and the vector index:
+
+    python -m benchmarks.bench_e2e --scales 1,10,100 --concurrency 8 --requests 100
+
+For each scale the catalog CSV is copied with jittered sizes and prices (as
+in bench_fit) into a temporary directory, and its vector index is derived
+from the real one instead of re-encoding every copy. A subprocess then boots
+main.py's app there on a local threaded server, with Groq replaced by
+benchmarks.fake_llm and Vision by benchmarks.fake_vision, both with
+artificial latency; the encoder is real. Each scenario sends ``--requests``
+requests at ``--concurrency`` and reports p50/p95/p99 latency, throughput,
+errors, the serving process's peak RSS so far and its current PSS. RSS
+counts a memory-mapped file page once per mapping, so the per-connection
+SQLite mmaps inflate it when several threads scan the catalog; PSS counts
+shared pages once. ``--baseline`` takes an earlier run's ``--output`` file
+and prints the change in p95 and peak RSS.
+"""
+import argparse
+import base64
+import io
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("chat_first", "chat_follow_up", "analyze_furniture", "analyze_moodboard",
+             "categories", "items", "fit")
+
+STYLES = ["white", "oak", "black", "compact", "modern", "cheap", "comfortable", "kids"]
+ITEMS = ["sofa", "bookcase", "bed", "desk", "wardrobe", "armchair", "bar stool", "coffee table",
+         "shelving unit", "dining chair"]
+CONSTRAINTS = ["", " under $200", " under $500", " under $1000", " for a small room", " by Ehlén Johansson"]
+FOLLOW_UPS = ["something cheaper", "what about in black?", "show me bigger ones", "any with storage?"]
+
+
+def chat_query(i):
+    rng = random.Random(i)
+    return f"{rng.choice(STYLES)} {rng.choice(ITEMS)}{rng.choice(CONSTRAINTS)}"
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def pss_mb():
+    """Proportional set size in MB, or NaN where /proc has no smaps_rollup."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def prepare_catalog(workdir, scale, model):
+    """Write the scaled CSV, its database and a vector index main.py will accept as current."""
+    import pandas as pd
+    from benchmarks.bench_fit import scaled_catalog
+    from catalog_db import build_catalog_db, csv_file, load_catalog_df
+    from embedding_registry import write_manifest
+    from generate_embeddings import create_detailed_descriptions, description_hashes, load_catalog_index
+    from vector_index import CatalogVectorIndex, normalize_rows
+
+    base_csv = os.path.join(BACKEND_DIR, csv_file)
+    base_db = os.path.join(BACKEND_DIR, "furniture.db")
+    build_catalog_db(base_csv, base_db)
+    base_index = load_catalog_index(load_catalog_df(base_db), model, os.path.join(BACKEND_DIR, "catalog_vectors.npy"))
+
+    raw = pd.read_csv(base_csv, index_col=0)
+    scaled_csv = os.path.join(workdir, csv_file)
+    scaled_catalog(raw, scale).to_csv(scaled_csv)
+    db_path = os.path.join(workdir, "furniture.db")
+    build_catalog_db(scaled_csv, db_path)
+
+    # Copy k of row j has row id k * len(raw) + j and gets row j's vector, slightly perturbed
+    texts = create_detailed_descriptions(load_catalog_df(db_path)).sort_index()
+    ids = texts.index.to_numpy()
+    vectors = np.empty((len(ids), base_index.dimension), dtype=np.float16)
+    rng = np.random.default_rng(0)
+    for start in range(0, len(ids), len(raw)):
+        block = ids[start:start + len(raw)]
+        source = base_index.lookup(raw.index.to_numpy()[block % len(raw)])
+        block_vectors = np.asarray(base_index.vectors[source], dtype=np.float32)
+        if start:
+            block_vectors += rng.normal(0, 0.01, block_vectors.shape).astype(np.float32)
+        vectors[start:start + len(block)] = normalize_rows(block_vectors)
+    path = os.path.join(workdir, "catalog_vectors.npy")
+    CatalogVectorIndex(ids, vectors, description_hashes(texts)).save(path)
+    write_manifest(path, model, rows=len(ids), synthetic_scale=scale)
+    return len(ids)
+
+
+def synthetic_images(count, seed=0):
+    """Distinct JPEGs of coloured blocks, so each one misses the perceptual-hash cache."""
+    from PIL import Image, ImageDraw
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        image = Image.new("RGB", (800, 600), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x, y = rng.randrange(800), rng.randrange(600)
+            draw.rectangle([x, y, x + rng.randrange(40, 300), y + rng.randrange(40, 300)],
+                           fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        images.append(buffer.getvalue())
+    return images
+
+
+def multipart(field, filename, content):
+    boundary = "decochatbench"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n").encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def send(base_url, method, path, body=None, headers=None):
+    """Milliseconds taken and whether the response was a 2xx."""
+    request = urllib.request.Request(base_url + path, data=body, headers=headers or {}, method=method)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            response.read()
+            ok = True
+    except urllib.error.HTTPError as e:
+        e.read()
+        ok = False
+    except OSError:
+        ok = False
+    return (time.perf_counter() - start) * 1000, ok
+
+
+def post_json(payload):
+    return json.dumps(payload).encode(), {"Content-Type": "application/json"}
+
+
+def run_scenario(name, build, base_url, requests, concurrency):
+    def one(i):
+        return send(base_url, *build(i))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    timings = [ms for ms, ok in results if ok] or [float("nan")]
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {
+        "scenario": name,
+        "p50Ms": p50,
+        "p95Ms": p95,
+        "p99Ms": p99,
+        "throughput": requests / wall,
+        "errors": sum(not ok for _, ok in results),
+        "peakRssMb": peak_rss_mb(),
+        "pssMb": pss_mb(),
+    }
+
+
+def serve(args):
+    """Boot main.py in this process (cwd is the scaled catalog's directory) and drive it."""
+    from benchmarks.fake_llm import FakeLLMServer
+    from benchmarks.fake_vision import FakeVisionClient
+
+    llm = FakeLLMServer(latency=args.llm_latency, token_delay=0).start()
+    os.environ.update({
+        "GROQ_API_BASE": llm.url,
+        "GROQ_API_KEY": "offline-benchmark",
+        "FURNITURE_DB_PATH": "furniture.db",
+        "CATALOG_VECTORS_PATH": "catalog_vectors.npy",
+        "IMAGE_CACHE_PATH": "image_cache.json",
+        "SESSION_BACKEND": "memory",
+    })
+    import vision_pipeline
+    vision_pipeline.set_vision_client(FakeVisionClient(latency=args.vision_latency))
+
+    start = time.perf_counter()
+    import main
+    main.warm_up()
+    startup_s = time.perf_counter() - start
+    startup_rss = peak_rss_mb()
+
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, main.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    categories = list(main.category_index.categories)
+    images = synthetic_images(args.requests, seed=args.scale)
+    rng = np.random.default_rng(0)
+    regions = rng.uniform([40, 30, 50], [400, 300, 260], size=(args.requests, 3))
+    builders = {
+        "chat_first": lambda i: ("POST", "/api/chat", *post_json({"message": chat_query(i), "chatId": f"first-{i}"})),
+        "chat_follow_up": lambda i: ("POST", "/api/chat", *post_json(
+            {"message": FOLLOW_UPS[i % len(FOLLOW_UPS)], "chatId": f"follow-{i}"})),
+        "analyze_furniture": lambda i: ("POST", "/api/analyze-furniture", *post_json(
+            {"image": base64.b64encode(images[i]).decode()})),
+        "analyze_moodboard": lambda i: ("POST", "/api/analyze-moodboard", *multipart("image", f"room-{i}.jpg", images[i])),
+        "categories": lambda i: ("GET", "/api/furniture-categories"),
+        "items": lambda i: ("GET", "/api/furniture-items/" + urllib.request.quote(categories[i % len(categories)])),
+        "fit": lambda i: ("POST", "/api/furniture-fit", *post_json(
+            {"width": regions[i][0], "depth": regions[i][1], "height": regions[i][2]})),
+    }
+
+    results = []
+    for name in args.scenarios.split(","):
+        if name == "chat_follow_up":
+            # Each follow-up session starts with an untimed first turn
+            run_scenario("setup", lambda i: ("POST", "/api/chat", *post_json(
+                {"message": chat_query(i + args.requests), "chatId": f"follow-{i}"})), base_url, args.requests, args.concurrency)
+        results.append(run_scenario(name, builders[name], base_url, args.requests, args.concurrency))
+
+    server.shutdown()
+    llm.stop()
+    with open(args.result, "w") as f:
+        json.dump({"startupS": startup_s, "startupRssMb": startup_rss, "scenarios": results}, f)
+
+
+def print_comparison(report, baseline):
+    """p95 latency and peak RSS of this run against an earlier one, per scale and scenario."""
+    before = {(result["scale"], row["scenario"]): row for result in baseline for row in result["scenarios"]}
+    print("\nvs baseline")
+    print(f"{'scale':>5} {'scenario':>18} {'p95 ms before':>13} {'after':>8} {'change':>7} "
+          f"{'RSS MB before':>13} {'after':>6}")
+    for result in report:
+        for row in result["scenarios"]:
+            old = before.get((result["scale"], row["scenario"]))
+            if old is None:
+                continue
+            change = row["p95Ms"] / old["p95Ms"] - 1
+            print(f"{str(result['scale']) + 'x':>5} {row['scenario']:>18} {old['p95Ms']:13.1f} {row['p95Ms']:8.1f} "
+                  f"{change:+7.0%} {old['peakRssMb']:13.0f} {row['peakRssMb']:6.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="1,10,100")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake Groq seconds per call")
+    parser.add_argument("--vision-latency", type=float, default=0.15, help="fake Vision seconds per call")
+    parser.add_argument("--model", default=None, help="embedding model key (default: EMBEDDING_MODEL)")
+    parser.add_argument("--output", default=None, help="also write all results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="an earlier --output file to compare against")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--scale", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--result", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    from embedding_registry import DEFAULT_EMBEDDING_MODEL
+    model = args.model or DEFAULT_EMBEDDING_MODEL
+    env = {**os.environ, "EMBEDDING_MODEL": model,
+           "PYTHONPATH": os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get("PYTHONPATH")]))}
+    report = []
+    for scale in (int(scale) for scale in args.scales.split(",")):
+        with tempfile.TemporaryDirectory(prefix=f"decochat-bench-{scale}x-") as workdir:
+            start = time.perf_counter()
+            rows = prepare_catalog(workdir, scale, model)
+            prepare_s = time.perf_counter() - start
+            result_path = os.path.join(workdir, "result.json")
+            log_path = os.path.join(workdir, "server.log")
+            command = [sys.executable, "-m", "benchmarks.bench_e2e", "--serve", "--scale", str(scale),
+                       "--result", result_path, "--scenarios", args.scenarios,
+                       "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                       "--llm-latency", str(args.llm_latency), "--vision-latency", str(args.vision_latency)]
+            with open(log_path, "w") as log:
+                returncode = subprocess.run(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT).returncode
+            if returncode != 0:
+                with open(log_path) as log:
+                    print(f"{scale}x failed:\n" + "".join(log.readlines()[-15:]))
+                continue
+            with open(result_path) as f:
+                result = json.load(f)
+
+        result.update(scale=scale, rows=rows, prepareS=prepare_s)
+        report.append(result)
+        print(f"\n{scale}x catalog: {rows} rows, prepared in {prepare_s:.1f}s, app started in "
+              f"{result['startupS']:.1f}s with {result['startupRssMb']:.0f}MB RSS")
+        print(f"{'scenario':>18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>7} {'errors':>6} "
+              f"{'peak RSS MB':>11} {'PSS MB':>6}")
+        for row in result["scenarios"]:
+            print(f"{row['scenario']:>18} {row['p50Ms']:8.1f} {row['p95Ms']:8.1f} {row['p99Ms']:8.1f} "
+                  f"{row['throughput']:7.1f} {row['errors']:6d} {row['peakRssMb']:11.0f} {row.get('pssMb', float('nan')):6.0f}")
+
+    if len(report) > 1:
+        print("\np95 ms by catalog scale")
+        print(f"{'scenario':>18} " + " ".join(f"{str(r['scale']) + 'x':>8}" for r in report))
+        for name in args.scenarios.split(","):
+            cells = [next((row["p95Ms"] for row in r["scenarios"] if row["scenario"] == name), float("nan"))
+                     for r in report]
+            print(f"{name:>18} " + " ".join(f"{cell:8.1f}" for cell in cells))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(report, json.load(f))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Latency and memory of each encoder backend on CPU.
+
+Run from backend/ after building furniture.db:
+
+    python -m benchmarks.bench_encoders --backends torch,torch-int8,onnx,onnx-int8
+
+Each backend is measured in its own subprocess, so resident memory is not
+shared between runs.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import numpy as np
+
+
+def rss_mb():
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(model, backend, queries, batch_size):
+    from benchmarks.bench_retrieval import QUERIES
+    from catalog_db import load_catalog_df
+    from embedding_registry import get_embeddings
+    from generate_embeddings import create_detailed_descriptions
+
+    texts = create_detailed_descriptions(load_catalog_df()).tolist()
+    baseline = rss_mb()
+    start = time.perf_counter()
+    embeddings = get_embeddings(model, backend)
+    load_s = time.perf_counter() - start
+    embeddings.embed_query("warm up")
+
+    timings = []
+    query_texts = [text for text, _ in QUERIES]
+    for i in range(queries):
+        start = time.perf_counter()
+        embeddings.embed_query(query_texts[i % len(query_texts)])
+        timings.append((time.perf_counter() - start) * 1000)
+
+    docs = texts[:batch_size * 8]
+    start = time.perf_counter()
+    for offset in range(0, len(docs), batch_size):
+        embeddings.embed_documents(docs[offset:offset + batch_size])
+    throughput = len(docs) / (time.perf_counter() - start)
+
+    p50, p95 = np.percentile(timings, [50, 95])
+    return {
+        "backend": backend,
+        "loadS": load_s,
+        "queryP50Ms": p50,
+        "queryP95Ms": p95,
+        "docsPerS": throughput,
+        "rssMb": rss_mb(),
+        "modelRssMb": rss_mb() - baseline,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--backends", default="torch,torch-int8,onnx,onnx-int8")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.model, args.worker, args.queries, args.batch_size)))
+        return
+
+    print(f"{'backend':>11} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'docs/s':>8} {'RSS MB':>7} {'model MB':>8}")
+    for backend in args.backends.split(","):
+        command = [sys.executable, "-m", "benchmarks.bench_encoders", "--worker", backend,
+                   "--queries", str(args.queries), "--batch-size", str(args.batch_size)]
+        if args.model:
+            command += ["--model", args.model]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{backend:>11} failed: {result.stderr.strip().splitlines()[-1:]}")
+            continue
+        row = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{backend:>11} {row['loadS']:7.2f} {row['queryP50Ms']:7.2f} {row['queryP95Ms']:7.2f} "
+              f"{row['docsPerS']:8.1f} {row['rssMb']:7.0f} {row['modelRssMb']:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Latency of FitIndex queries on the catalog scaled up with jittered copies.
+
+Run from backend/ after building furniture.db:
+
+    python -m benchmarks.bench_fit --scale 100
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from catalog_db import load_catalog_df
+from fit_index import FitIndex
+
+
+def scaled_catalog(df, scale, seed=0):
+    rng = np.random.default_rng(seed)
+    copies = []
+    for i in range(scale):
+        copy = df.copy()
+        if i:
+            for column in ("width", "depth", "height", "price"):
+                copy[column] = copy[column] * rng.uniform(0.9, 1.1, len(copy))
+        copies.append(copy)
+    scaled = pd.concat(copies, ignore_index=True)
+    scaled.index.name = "row_id"
+    return scaled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    df = scaled_catalog(load_catalog_df(), args.scale)
+    start = time.perf_counter()
+    index = FitIndex(df)
+    print(f"Built index over {len(index)} measured items in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    rng = np.random.default_rng(1)
+    regions = rng.uniform([40, 30, 50], [400, 300, 260], size=(args.queries, 3))
+    for sort in ("price", "fit"):
+        timings = []
+        for width, depth, height in regions:
+            start = time.perf_counter()
+            index.query(width, depth, height, sort=sort)
+            timings.append((time.perf_counter() - start) * 1000)
+        p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+        print(f"sort={sort}: p50 {p50:.3f}ms, p95 {p95:.3f}ms, p99 {p99:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Offline recall@k and latency of dense, BM25 and hybrid catalog retrieval.
+
+Run from backend/ after building furniture.db and the vector index:
+
+    python -m benchmarks.bench_retrieval --model minilm
+
+Relevance comes from catalog fields rather than hand-labelled row ids, so
+the query set stays valid when the catalog is rebuilt.
+"""
+import argparse
+import time
+import numpy as np
+from catalog_db import load_catalog_df
+from embedding_registry import DEFAULT_EMBEDDING_MODEL, get_embeddings
+from generate_embeddings import load_catalog_index
+from retrieval import HybridRetriever, LexicalIndex
+
+
+def _desc(df, text):
+    description = df["short_description"].str.replace(r"\s+", " ", regex=True)
+    return description.str.contains(text, case=False, regex=False, na=False)
+
+
+# (query, predicate selecting the relevant catalog rows)
+QUERIES = [
+    ("FREKVENS", lambda df: df["name"] == "FREKVENS"),
+    ("HEMNES 120cm", lambda df: (df["name"] == "HEMNES") & _desc(df, "120")),
+    ("poang armchair", lambda df: (df["name"] == "POÄNG") & _desc(df, "armchair")),
+    ("BILLY bookcase", lambda df: (df["name"] == "BILLY") & _desc(df, "bookcase")),
+    ("KALLAX shelving unit", lambda df: (df["name"] == "KALLAX") & _desc(df, "shelving unit")),
+    ("EKTORP sofa", lambda df: (df["name"] == "EKTORP") & (df["category"] == "Sofas & armchairs")),
+    ("MALM bed frame", lambda df: (df["name"] == "MALM") & (df["category"] == "Beds")),
+    ("LACK coffee table", lambda df: (df["name"] == "LACK") & _desc(df, "coffee table")),
+    ("3-seat sofa-bed", lambda df: _desc(df, "3-seat sofa-bed")),
+    ("table 120x60", lambda df: _desc(df, "table, 120x60")),
+    ("wardrobe 150x66x236", lambda df: _desc(df, "wardrobe, 150x66x236")),
+    ("chair designed by Francis Cayouette",
+     lambda df: (df["category"] == "Chairs") & df["designer"].str.contains("Cayouette", na=False)),
+    ("bar stool", lambda df: _desc(df, "bar stool")),
+    ("children's desk", lambda df: (df["category"] == "Children's furniture") & _desc(df, "desk")),
+    ("glass-door cabinet", lambda df: _desc(df, "glass-door cabinet")),
+    ("TV bench", lambda df: _desc(df, "tv bench")),
+    ("chest of 3 drawers", lambda df: _desc(df, "chest of 3 drawers")),
+    ("room divider", lambda df: df["category"] == "Room dividers"),
+    ("kitchen trolley", lambda df: (df["category"] == "Trolleys") & _desc(df, "kitchen trolley")),
+    ("outdoor table and chairs", lambda df: (df["category"] == "Outdoor furniture") & _desc(df, "table and")),
+]
+
+
+def recall_at_k(results, relevant, k):
+    found = {row_id for row_id, _ in results[:k]}
+    return len(found & relevant) / min(len(relevant), k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--ks", default="5,20")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    ks = [int(k) for k in args.ks.split(",")]
+
+    df = load_catalog_df()
+    embeddings = get_embeddings(args.model)
+    dense = load_catalog_index(df, args.model)
+    start = time.perf_counter()
+    lexical = LexicalIndex(df)
+    print(f"Built BM25 index over {len(df)} rows in {(time.perf_counter() - start) * 1000:.1f}ms")
+    hybrid = HybridRetriever(dense, lexical)
+
+    queries = []
+    for text, predicate in QUERIES:
+        relevant = set(df.index[predicate(df)].tolist())
+        if relevant:
+            queries.append((text, embeddings.embed_query(text), relevant))
+        else:
+            print(f"Skipping '{text}': no relevant rows in this catalog")
+
+    depth = max(ks)
+    methods = {
+        "dense": lambda text, vector: dense.search(vector, k=depth),
+        "bm25": lambda text, vector: lexical.search(text, k=depth),
+        "hybrid": lambda text, vector: hybrid.search(text, vector, k=depth),
+    }
+    print(f"{len(queries)} queries, model {args.model}")
+    for name, search in methods.items():
+        recalls = {k: [] for k in ks}
+        timings = []
+        for text, vector, relevant in queries:
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                results = search(text, vector)
+                timings.append((time.perf_counter() - start) * 1000)
+            for k in ks:
+                recalls[k].append(recall_at_k(results, relevant, k))
+        recall_text = ", ".join(f"recall@{k} {np.mean(values):.3f}" for k, values in recalls.items())
+        p50, p95 = np.percentile(timings, [50, 95])
+        print(f"{name:>6}: {recall_text}, p50 {p50:.3f}ms, p95 {p95:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
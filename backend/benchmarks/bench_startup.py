@@ -0,0 +1,152 @@
+"""Startup time and per-worker memory of the production server.
+
+Run from backend/ after building furniture.db and the catalog index:
+
+    python -m benchmarks.bench_startup --workers 4
+
+First times importing ``main`` and warming up in a fresh interpreter, then
+starts gunicorn with and without ``preload_app`` and reports the time until
+every worker answers ``/api/ready`` and each worker's RSS, PSS and USS. PSS
+splits shared pages between the processes that map them, so it shows what
+copy-on-write sharing of the preloaded models saves; USS is what a worker
+alone holds. Memory figures are read from /proc, so Linux only.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.warm_up()
+warmed = time.perf_counter()
+print(json.dumps({
+    "importS": imported - start,
+    "warmupS": warmed - imported,
+    "visionImported": "google.cloud.vision" in sys.modules,
+}))
+"""
+
+
+def memory_mb(pid):
+    """RSS, PSS and USS (private clean + dirty) of ``pid`` in MB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "uss": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def child_pids(parent):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name is in parentheses and may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == parent:
+            children.append(int(entry))
+    return children
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import():
+    result = subprocess.run([sys.executable, "-c", IMPORT_PROBE], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_gunicorn(workers, preload, timeout):
+    port = free_port()
+    env = {**os.environ, "GUNICORN_PRELOAD": "1" if preload else "0",
+           "WEB_CONCURRENCY": str(workers), "GUNICORN_BIND": f"127.0.0.1:{port}"}
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    ready = {}
+    first_ready = None
+    try:
+        while len(ready) < workers:
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f"{len(ready)} of {workers} workers ready after {timeout}s")
+            if server.poll() is not None:
+                raise RuntimeError(server.stderr.read().strip().splitlines()[-1:])
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/ready", timeout=1) as response:
+                    body = json.loads(response.read())
+                    ready.setdefault(body["pid"], body["warmupMs"])
+                    first_ready = first_ready or time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                time.sleep(0.05)
+        all_ready = time.perf_counter() - start
+        worker_memory = [memory_mb(pid) for pid in child_pids(server.pid)]
+        return {
+            "preload": preload,
+            "firstReadyS": first_ready,
+            "allReadyS": all_ready,
+            "warmupMs": max(ready.values()),
+            "master": memory_mb(server.pid),
+            "workers": worker_memory,
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for every worker")
+    parser.add_argument("--skip-import", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_import:
+        result = measure_import()
+        print(f"import main: {result['importS']:.2f}s, warm-up: {result['warmupS']:.2f}s, "
+              f"google.cloud.vision imported: {result['visionImported']}")
+
+    print(f"{'preload':>7} {'first s':>7} {'all s':>6} {'warm ms':>7} {'RSS/wkr':>7} {'PSS/wkr':>7} "
+          f"{'USS/wkr':>7} {'PSS total':>9}")
+    for preload in (True, False):
+        try:
+            row = measure_gunicorn(args.workers, preload, args.timeout)
+        except Exception as e:
+            print(f"{str(preload):>7} failed: {e}")
+            continue
+        workers = row["workers"] or [{"rss": 0.0, "pss": 0.0, "uss": 0.0}]
+        mean = {key: sum(w[key] for w in workers) / len(workers) for key in ("rss", "pss", "uss")}
+        total_pss = row["master"]["pss"] + sum(w["pss"] for w in row["workers"])
+        print(f"{str(preload):>7} {row['firstReadyS']:7.2f} {row['allReadyS']:6.2f} {row['warmupMs']:7.0f} "
+              f"{mean['rss']:7.0f} {mean['pss']:7.0f} {mean['uss']:7.0f} {total_pss:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
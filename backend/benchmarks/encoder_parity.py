@@ -0,0 +1,98 @@
+"""Check that an encoder backend agrees with the fp32 torch reference.
+
+Run from backend/ after building furniture.db:
+
+    python -m benchmarks.encoder_parity --backend onnx-int8
+
+Reports the cosine between both backends' vectors for catalog descriptions
+and queries, and the top-k overlap of query results, both when the index is
+re-embedded with the backend and when only queries use it against the fp32
+index. Exits non-zero when agreement falls below the thresholds. The
+same check runs as ``tests/test_encoder_parity.py`` and in the Docker build
+for any backend other than torch.
+"""
+import argparse
+import sys
+import numpy as np
+from benchmarks.bench_retrieval import QUERIES
+from catalog_db import load_catalog_df
+from embedding_registry import DEFAULT_EMBEDDING_MODEL, EMBEDDING_BACKENDS, get_embeddings
+from generate_embeddings import create_detailed_descriptions
+from vector_index import normalize_rows
+
+
+def top_k(queries, docs, k):
+    scores = queries @ docs.T
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+
+def overlap(a, b):
+    return np.mean([len(set(x) & set(y)) / len(x) for x, y in zip(a, b)])
+
+
+MIN_COSINE = 0.98
+MIN_OVERLAP = 0.8
+
+
+def parity(backend, reference="torch", model=DEFAULT_EMBEDDING_MODEL, docs=1000, k=10, catalog=None):
+    """Agreement between ``backend`` and ``reference`` on catalog descriptions and queries.
+
+    ``catalog`` is the catalog DataFrame (default: furniture.db). Returns the
+    per-text cosines and the top-``k`` overlap with the index re-embedded by
+    ``backend`` and with the ``reference`` index.
+    """
+    texts = create_detailed_descriptions(load_catalog_df() if catalog is None else catalog)
+    doc_texts = texts.sample(min(docs, len(texts)), random_state=0).tolist()
+    queries = [text for text, _ in QUERIES]
+
+    vectors = {}
+    for name in (reference, backend):
+        embeddings = get_embeddings(model, name)
+        vectors[name] = (
+            normalize_rows(embeddings.embed_documents(doc_texts)),
+            normalize_rows([embeddings.embed_query(query) for query in queries]),
+        )
+    ref_docs, ref_queries = vectors[reference]
+    docs_vectors, query_vectors = vectors[backend]
+
+    reference_top = top_k(ref_queries, ref_docs, k)
+    return {
+        "docs": len(doc_texts),
+        "queries": len(queries),
+        "doc_cosine": np.sum(ref_docs * docs_vectors, axis=1),
+        "query_cosine": np.sum(ref_queries * query_vectors, axis=1),
+        "reembedded_overlap": overlap(reference_top, top_k(query_vectors, docs_vectors, k)),
+        "reference_overlap": overlap(reference_top, top_k(query_vectors, ref_docs, k)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--backend", required=True, choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--reference", default="torch", choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--docs", type=int, default=1000, help="catalog descriptions to compare")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-cosine", type=float, default=MIN_COSINE)
+    parser.add_argument("--min-overlap", type=float, default=MIN_OVERLAP)
+    args = parser.parse_args()
+
+    result = parity(args.backend, args.reference, args.model, args.docs, args.k)
+    doc_cosine, query_cosine = result["doc_cosine"], result["query_cosine"]
+    reembedded, mixed = result["reembedded_overlap"], result["reference_overlap"]
+
+    print(f"{args.model}: {args.backend} vs {args.reference}, {result['docs']} docs, {result['queries']} queries")
+    print(f"  doc cosine   mean {doc_cosine.mean():.4f}, min {doc_cosine.min():.4f}")
+    print(f"  query cosine mean {query_cosine.mean():.4f}, min {query_cosine.min():.4f}")
+    print(f"  top-{args.k} overlap, index re-embedded: {reembedded:.3f}")
+    print(f"  top-{args.k} overlap, fp32 index:        {mixed:.3f}")
+
+    min_cosine = min(doc_cosine.min(), query_cosine.min())
+    if min_cosine < args.min_cosine or min(reembedded, mixed) < args.min_overlap:
+        print(f"FAIL: expected cosine >= {args.min_cosine} and overlap >= {args.min_overlap}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Local stand-in for the Groq chat completions API with configurable latency.
+
+Serves the OpenAI-compatible ``/openai/v1/chat/completions`` endpoint that
+``ChatGroq`` calls, including streaming, and answers with canned SQL, care
+guide, moodboard or recommendation text depending on the prompt. Point the
+app at it with:
+
+    python -m benchmarks.fake_llm --port 8900 --latency 0.5
+    GROQ_API_BASE=http://127.0.0.1:8900 GROQ_API_KEY=fake python main.py
+
+``GET /stats`` reports how many completions were requested and the most
+that were open at once.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SQL_RESPONSE = "SELECT * FROM furniture WHERE category LIKE '%Sofa%' AND price <= 500"
+CARE_GUIDE_RESPONSE = json.dumps({
+    "materials": "Solid pine with a clear lacquer finish.",
+    "cleaningTips": "Wipe with a damp cloth and dry immediately.",
+    "maintenanceSchedule": "Tighten fittings every six months; re-oil yearly.",
+})
+MOODBOARD_RESPONSE = json.dumps({
+    "vibe": "Bright Scandinavian living room with natural wood and soft textiles.",
+    "categories": ["Sofas & armchairs", "Bookcases & shelving units", "Tables & desks"],
+})
+
+
+def canned_response(messages):
+    text = " ".join(str(message.get("content", "")) for message in messages)
+    if "SQL query generator" in text:
+        return SQL_RESPONSE
+    if "care guide" in text:
+        return CARE_GUIDE_RESPONSE
+    if "vibe" in text:
+        return MOODBOARD_RESPONSE
+    query = text.split("User query: '", 1)[-1].split("'", 1)[0][:80]
+    return (f"- **Top pick** for \"{query}\": the first match is the best value for its size.\n"
+            "- **Alternative**: the second match if you prefer a lighter finish.")
+
+
+class FakeLLMServer:
+    """Threaded HTTP server answering chat completions after ``latency`` seconds.
+
+    ``latency`` and ``token_delay`` (between streamed chunks) can be changed
+    while the server runs.
+    """
+
+    def __init__(self, port=0, latency=0.2, token_delay=0.01):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.requests = self.active = self.max_active = 0
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "active": self.active, "maxActive": self.max_active}
+
+    def _enter(self):
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def _leave(self):
+        with self._lock:
+            self.active -= 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/stats":
+                    self._send_json(200, server.stats())
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                server._enter()
+                try:
+                    time.sleep(server.latency)
+                    content = canned_response(body.get("messages", []))
+                    if body.get("stream"):
+                        self._stream(body, content)
+                    else:
+                        self._send_json(200, completion(body, content))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    server._leave()
+
+            def _stream(self, body, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                words = content.split(" ")
+                for i, word in enumerate(words):
+                    delta = {"content": word + (" " if i < len(words) - 1 else "")}
+                    if i == 0:
+                        delta["role"] = "assistant"
+                    self._write_event(chunk(body, delta, None))
+                    time.sleep(server.token_delay)
+                final = chunk(body, {}, "stop")
+                final["x_groq"] = {"id": final["id"], "usage": usage(body, content)}
+                self._write_event(final)
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def _write_event(self, payload):
+                self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+
+            def _write_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def usage(body, content):
+    prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in body.get("messages", []))
+    completion_tokens = len(content.split())
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def completion(body, content):
+    return {
+        "id": f"chatcmpl-fake-{time.monotonic_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                     "finish_reason": "stop", "logprobs": None}],
+        "usage": usage(body, content),
+    }
+
+
+def chunk(body, delta, finish_reason):
+    return {
+        "id": f"chatcmpl-fake-{time.monotonic_ns()}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before each response starts")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between streamed chunks")
+    args = parser.parse_args()
+    server = FakeLLMServer(args.port, args.latency, args.token_delay)
+    print(f"Fake LLM listening on {server.url} (latency {args.latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Deterministic stand-in for ``vision.ImageAnnotatorClient`` with artificial latency.
+
+Install it before requests arrive with ``vision_pipeline.set_vision_client``.
+The same image bytes always get the same labels, objects and colors.
+"""
+import hashlib
+import time
+from types import SimpleNamespace
+
+LABELS = ["Furniture", "Wood", "Table", "Chair", "Couch", "Shelf", "Interior design", "Living room",
+          "Bedroom", "Lamp", "Textile", "Rectangle", "Floor", "Cabinetry", "Comfort", "Drawer"]
+OBJECTS = ["Table", "Chair", "Couch", "Shelf", "Bed", "Lamp", "Cabinet", "Desk"]
+
+
+class FakeVisionClient:
+    def __init__(self, latency=0.15):
+        self.latency = latency
+
+    def annotate_image(self, request):
+        time.sleep(self.latency)
+        digest = hashlib.blake2b(request["image"]["content"], digest_size=16).digest()
+        labels = [LABELS[b % len(LABELS)] for b in digest[:5]]
+        objects = [OBJECTS[b % len(OBJECTS)] for b in digest[5:7]]
+        colors = [
+            SimpleNamespace(color=SimpleNamespace(red=digest[i], green=digest[i + 1], blue=digest[i + 2]),
+                            score=round(0.5 - i / 40, 3))
+            for i in (7, 10, 13)
+        ]
+        return SimpleNamespace(
+            error=SimpleNamespace(message=""),
+            label_annotations=[SimpleNamespace(description=label) for label in dict.fromkeys(labels)],
+            localized_object_annotations=[SimpleNamespace(name=name) for name in dict.fromkeys(objects)],
+            image_properties_annotation=SimpleNamespace(dominant_colors=SimpleNamespace(colors=colors)),
+        )
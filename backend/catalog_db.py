@@ -0,0 +1,134 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+import pandas as pd
+
+csv_file = "IKEA_SA_Furniture_Web_Scrapings_sss.csv"
+db_path = os.getenv("FURNITURE_DB_PATH", "furniture.db")
+
+# Bump when the table layout, indexes or derived columns change
+SCHEMA_VERSION = 2
+
+INDEXED_COLUMNS = ["category", "price", "width", "depth", "height", "item_id"]
+
+
+def csv_digest(path=csv_file):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def catalog_version(conn):
+    """The version string stored in a built database, or None if it has none."""
+    try:
+        row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'version'").fetchone()
+    except sqlite3.DatabaseError:
+        return None
+    return row[0] if row else None
+
+
+def catalog_built_at(conn):
+    """Unix time the database was built, or None if it was not recorded."""
+    try:
+        row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'built_at'").fetchone()
+    except sqlite3.DatabaseError:
+        return None
+    return int(row[0]) if row else None
+
+
+def read_catalog_csv(path=csv_file):
+    """Load the catalog CSV keyed by its row id, with the short search description."""
+    df = pd.read_csv(path, index_col=0)
+    df.index.name = "row_id"
+    # Create a combined description field for better search
+    df["description"] = df["name"] + " - " + df["short_description"].fillna("") + " - " + df["category"]
+    # Clean up price data
+    df["price"] = pd.to_numeric(df["price"], errors="coerce")
+    return df
+
+
+def _write_catalog_db(df, path, version):
+    conn = sqlite3.connect(path)
+    try:
+        # WAL lets readers keep reading without taking the rollback-journal lock
+        conn.execute("PRAGMA journal_mode = WAL")
+        df.to_sql("furniture", conn, index=True, index_label="row_id", if_exists="replace")
+        conn.execute("CREATE UNIQUE INDEX idx_furniture_row_id ON furniture(row_id)")
+        for column in INDEXED_COLUMNS:
+            conn.execute(f"CREATE INDEX idx_furniture_{column} ON furniture({column})")
+        conn.execute("CREATE INDEX idx_furniture_category_price ON furniture(category, price)")
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE furniture_fts USING fts5("
+                "row_id UNINDEXED, name, short_description)"
+            )
+            conn.execute(
+                "INSERT INTO furniture_fts (row_id, name, short_description) "
+                "SELECT row_id, name, short_description FROM furniture"
+            )
+        except sqlite3.OperationalError as e:
+            print(f"FTS5 unavailable, skipping furniture_fts: {e}")
+        conn.execute("CREATE TABLE catalog_meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.executemany(
+            "INSERT INTO catalog_meta (key, value) VALUES (?, ?)",
+            [("version", version), ("built_at", str(int(time.time())))],
+        )
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+def build_catalog_db(csv_path=csv_file, path=db_path, force=False):
+    """Rebuild ``path`` from the CSV only when the CSV or schema version changed.
+
+    The database is written to a private temporary file and swapped in with an
+    atomic rename, so processes starting together never see a half-built file.
+    Returns True if a new database was written.
+    """
+    version = f"{SCHEMA_VERSION}:{csv_digest(csv_path)}"
+    if not force and os.path.exists(path):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            if catalog_version(conn) == version:
+                return False
+        finally:
+            conn.close()
+
+    print(f"Building {path} from {csv_path}")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        _write_catalog_db(read_catalog_csv(csv_path), tmp_path, version)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+
+def open_catalog_db(path=db_path):
+    """Open the built catalog database read-only."""
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def load_catalog_df(path=db_path):
+    """Read the catalog back from the built database, keyed by row id."""
+    conn = open_catalog_db(path)
+    try:
+        df = pd.read_sql_query("SELECT * FROM furniture", conn, index_col="row_id")
+    finally:
+        conn.close()
+    df["sellable_online"] = df["sellable_online"].astype(bool)
+    return df
+
+
+if __name__ == "__main__":
+    if build_catalog_db(force="--force" in sys.argv):
+        print("Catalog database built successfully!")
+    else:
+        print("Catalog database is up to date.")
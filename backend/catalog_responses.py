@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from flask import Response
+import pandas as pd
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Browsers and CDNs may reuse a response this long before revalidating with a 304
+MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", "300"))
+ITEM_FIELDS = ["name", "width", "height", "depth", "description"]
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+
+class Payload:
+    """One serialized JSON body with its compressed forms and validator."""
+
+    def __init__(self, data, precompress=True):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = hashlib.blake2b(self.body, digest_size=12).hexdigest()
+        self.encoded = {}
+        if len(self.body) >= MIN_COMPRESS_BYTES:
+            self.encoded["gzip"] = gzip.compress(self.body, compresslevel=9 if precompress else 6, mtime=0)
+            if brotli is not None:
+                self.encoded["br"] = brotli.compress(self.body, quality=11 if precompress else 5)
+
+
+class CatalogResponses:
+    """Planner catalog responses serialized once per process.
+
+    The category list and each category's full item list are built and
+    compressed at startup; the catalog only changes across a restart.
+    Paginated or field-selected variants are sliced from the same prepared
+    item lists and kept in a small LRU, so no request queries SQLite or
+    deduplicates names again.
+    """
+
+    def __init__(self, df, built_at=None, max_variants=256):
+        self.max_variants = max_variants
+        self._lock = threading.Lock()
+        categories = [str(category) for category in df["category"].dropna().unique()]
+        measured = df.dropna(subset=["category", "width", "height", "depth"])
+        measured = measured.drop_duplicates(subset=["category", "name"], keep="first")
+        measured = measured.astype(object).where(pd.notna(measured), None)
+
+        items = {category: [] for category in categories}
+        for category, group in measured.groupby("category", sort=False):
+            items[category] = [
+                {
+                    "name": name,
+                    "width": width,
+                    "height": height,
+                    "depth": depth,
+                    "description": description,
+                }
+                for name, width, height, depth, description in zip(
+                    group["name"], group["width"], group["height"], group["depth"], group["short_description"]
+                )
+            ]
+
+        modified = datetime.fromtimestamp(int(built_at), timezone.utc) if built_at else datetime.now(timezone.utc)
+        self._state = {
+            "items": items,
+            "categories": Payload({"categories": categories}),
+            "full": {category: Payload({"items": rows}) for category, rows in items.items()},
+            "empty": Payload({"items": []}),
+            "variants": OrderedDict(),
+            "last_modified": modified.replace(microsecond=0),
+        }
+        print(f"Prepared catalog responses for {len(categories)} categories")
+
+    def categories(self):
+        return self._state["categories"], self._state["last_modified"]
+
+    def items(self, category, offset=0, limit=None, fields=None):
+        """The item list payload for ``category``, optionally paged and trimmed to ``fields``."""
+        state = self._state
+        if offset == 0 and limit is None and fields is None:
+            return state["full"].get(category, state["empty"]), state["last_modified"]
+
+        key = (category, offset, limit, fields)
+        with self._lock:
+            payload = state["variants"].get(key)
+            if payload is not None:
+                state["variants"].move_to_end(key)
+                return payload, state["last_modified"]
+
+        rows = state["items"].get(category, [])
+        page = rows[offset:offset + limit] if limit is not None else rows[offset:]
+        if fields is not None:
+            page = [{field: row[field] for field in fields} for row in page]
+        data = {"items": page, "total": len(rows), "offset": offset}
+        if limit is not None:
+            data["limit"] = limit
+            if offset + limit < len(rows):
+                data["nextOffset"] = offset + limit
+        payload = Payload(data, precompress=False)
+
+        with self._lock:
+            state["variants"][key] = payload
+            while len(state["variants"]) > self.max_variants:
+                state["variants"].popitem(last=False)
+        return payload, state["last_modified"]
+
+
+def parse_item_query(args):
+    """(offset, limit, fields) from request args; raises ValueError on bad input."""
+    offset = int(args.get("offset", 0))
+    limit = args.get("limit")
+    limit = int(limit) if limit is not None else None
+    if offset < 0 or (limit is not None and limit <= 0):
+        raise ValueError("offset must be >= 0 and limit > 0")
+    fields = args.get("fields")
+    if fields is not None:
+        fields = tuple(field.strip() for field in fields.split(",") if field.strip())
+        unknown = [field for field in fields if field not in ITEM_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown fields {unknown}; choose from {', '.join(ITEM_FIELDS)}")
+    return offset, limit, fields
+
+
+def conditional_response(payload, last_modified, request):
+    """A 304 when the client's copy is current, else the best encoded body."""
+    headers = {
+        "Cache-Control": f"public, max-age={MAX_AGE}",
+        "Vary": "Accept-Encoding",
+    }
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(payload.etag)
+    else:
+        not_modified = request.if_modified_since is not None and last_modified <= request.if_modified_since
+
+    if not_modified:
+        response = Response(status=304, headers=headers)
+    else:
+        body = payload.body
+        for encoding in ("br", "gzip"):
+            if encoding in payload.encoded and request.accept_encodings[encoding] > 0:
+                body = payload.encoded[encoding]
+                headers["Content-Encoding"] = encoding
+                break
+        response = Response(body, mimetype="application/json", headers=headers)
+    response.set_etag(payload.etag, weak=True)
+    response.last_modified = last_modified
+    return response
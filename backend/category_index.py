@@ -0,0 +1,80 @@
+import difflib
+import re
+import threading
+import numpy as np
+from filter_parser import CATEGORY_SYNONYMS
+
+SAMPLE_COLUMNS = ["name", "short_description", "price", "link"]
+
+
+class CategoryIndex:
+    """Catalog rows grouped by category, held in memory for sampling.
+
+    Built from the catalog DataFrame (indexed by ``row_id``) at startup; the
+    catalog only changes across a restart. Category names from the LLM are
+    resolved exactly, case-insensitively, through the filter parser's
+    synonyms, by substring, by any single word and finally by fuzzy match.
+    """
+
+    def __init__(self, df, seed=None):
+        self._rng = np.random.default_rng(seed)
+        self._rng_lock = threading.Lock()
+        df = df.dropna(subset=["category"])
+        rows = {column: df[column].tolist() for column in SAMPLE_COLUMNS}
+        rows["row_id"] = df.index.to_numpy(dtype=np.int64)
+        positions = {
+            category: np.asarray(members, dtype=np.int64)
+            for category, members in df.reset_index(drop=True).groupby("category", sort=True).indices.items()
+        }
+        aliases = {category.lower(): category for category in positions}
+        for category, synonyms in CATEGORY_SYNONYMS.items():
+            if category in positions:
+                for phrase in synonyms:
+                    aliases.setdefault(phrase, category)
+        self._state = (rows, positions, aliases)
+        print(f"Category index: {len(positions)} categories, {len(rows['row_id'])} rows")
+
+    @property
+    def categories(self):
+        return list(self._state[1])
+
+    def resolve(self, name):
+        """The catalog category meant by ``name``, or None."""
+        _, positions, aliases = self._state
+        if name in positions:
+            return name
+        key = " ".join(name.lower().split())
+        if key in aliases:
+            return aliases[key]
+        partial = [category for category in positions if key and key in category.lower()]
+        if partial:
+            return partial[0]
+        for word in re.findall(r"[\w']+", key):
+            if word in aliases:
+                return aliases[word]
+        close = difflib.get_close_matches(key, list(aliases), n=1, cutoff=0.8)
+        return aliases[close[0]] if close else None
+
+    def row_ids(self, category):
+        rows, positions, _ = self._state
+        resolved = self.resolve(category)
+        if resolved is None:
+            return np.empty(0, dtype=np.int64)
+        return rows["row_id"][positions[resolved]]
+
+    def sample(self, category, exclude_names=()):
+        """A random row of ``category`` whose name is not in ``exclude_names``, or None."""
+        rows, positions, _ = self._state
+        resolved = self.resolve(category)
+        if resolved is None:
+            return None
+        members = positions[resolved]
+        with self._rng_lock:
+            order = self._rng.permutation(len(members))
+        for i in order:
+            pos = members[i]
+            if rows["name"][pos] not in exclude_names:
+                item = {column: rows[column][pos] for column in SAMPLE_COLUMNS}
+                item["row_id"] = int(rows["row_id"][pos])
+                return item
+        return None
@@ -0,0 +1,122 @@
+import os
+import re
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+# Upper-case product names such as HEMNES or FREKVENS in earlier answers
+_PRODUCT_NAME = re.compile(r"\b[A-ZÅÄÖÆØÜ][A-ZÅÄÖÆØÜ\-]{2,}\b")
+
+
+def count_tokens(text):
+    """Cheap token estimate: words and punctuation marks."""
+    return len(_TOKEN.findall(text))
+
+
+def truncate_tokens(text, budget, keep="end"):
+    """Trim ``text`` to about ``budget`` tokens, keeping its start or its end."""
+    spans = [m.span() for m in _TOKEN.finditer(text)]
+    if len(spans) <= budget:
+        return text
+    if budget <= 0:
+        return ""
+    if keep == "end":
+        return text[spans[-budget][0]:]
+    return text[:spans[budget - 1][1]]
+
+
+class ContextBuilder:
+    """Builds follow-up context for each downstream consumer within its own token budget.
+
+    - retrieval: only what the user typed, newest first, for the query embedding
+    - sql: the new message plus constraints already extracted from earlier turns
+    - answer: a rolling summary of older turns plus the most recent turns in full
+    """
+
+    def __init__(self, retrieval_budget=64, sql_budget=256, answer_budget=1500, recent_turns=2):
+        self.retrieval_budget = retrieval_budget
+        self.sql_budget = sql_budget
+        self.answer_budget = answer_budget
+        self.recent_turns = recent_turns
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            retrieval_budget=int(os.getenv("CONTEXT_RETRIEVAL_TOKENS", "64")),
+            sql_budget=int(os.getenv("CONTEXT_SQL_TOKENS", "256")),
+            answer_budget=int(os.getenv("CONTEXT_ANSWER_TOKENS", "1500")),
+            recent_turns=int(os.getenv("CONTEXT_RECENT_TURNS", "2")),
+        )
+
+    def retrieval_context(self, user_input, history):
+        parts = [user_input]
+        used = count_tokens(user_input)
+        for entry in reversed(history):
+            cost = count_tokens(entry["query"])
+            if used + cost > self.retrieval_budget:
+                break
+            parts.append(entry["query"])
+            used += cost
+        return truncate_tokens(". ".join(parts), self.retrieval_budget, keep="start")
+
+    def sql_context(self, user_input, history, constraints=""):
+        lines = []
+        if constraints:
+            lines.append(f"Constraints extracted so far: {constraints}")
+        earlier = [entry["query"] for entry in history[-self.recent_turns:]]
+        if earlier:
+            lines.append("Earlier requests: " + " | ".join(earlier))
+        lines.append(f"User: {user_input}")
+        context = "\n".join(lines)
+        if count_tokens(context) > self.sql_budget:
+            context = truncate_tokens(context, self.sql_budget, keep="end")
+        return context
+
+    @staticmethod
+    def summarize(turns):
+        """One line per older turn: what was asked and which products were suggested."""
+        lines = []
+        for entry in turns:
+            names = list(dict.fromkeys(_PRODUCT_NAME.findall(entry["response"])))[:5]
+            suggested = f" -> suggested {', '.join(names)}" if names else ""
+            lines.append(f"- {entry['query']}{suggested}")
+        return "\n".join(lines)
+
+    def answer_context(self, user_input, history):
+        recent = history[-self.recent_turns:] if self.recent_turns else []
+        older = history[:len(history) - len(recent)]
+        current = f"User: {user_input}"
+        budget = self.answer_budget - count_tokens(current)
+
+        # Split the budget between recent turns, keeping the start of each answer
+        per_turn = budget // len(recent) if recent else 0
+        recent_text = "\n".join(
+            f"User: {entry['query']}\nAssistant: "
+            + truncate_tokens(entry["response"], per_turn - count_tokens(entry["query"]) - 4, keep="start")
+            for entry in recent
+        )
+        budget -= count_tokens(recent_text)
+
+        parts = []
+        if older and budget > 0:
+            summary = truncate_tokens(self.summarize(older), budget, keep="end")
+            if summary:
+                parts.append(f"Summary of the earlier conversation:\n{summary}")
+        if recent_text:
+            parts.append(recent_text)
+        parts.append(current)
+        return "\n".join(parts)
+
+
+def full_context(user_input, history):
+    """The untrimmed history text every consumer used to receive."""
+    turns = "".join(f"User: {entry['query']}\nAssistant: {entry['response']}\n" for entry in history)
+    return f"{turns}User: {user_input}"
+
+
+def log_token_savings(user_input, history, **contexts):
+    """Print how many tokens each consumer received versus the full history text."""
+    full = count_tokens(full_context(user_input, history))
+    sizes = {name: count_tokens(text) for name, text in contexts.items()}
+    saved = sum(max(full - size, 0) for size in sizes.values())
+    detail = ", ".join(f"{name} {size}" for name, size in sizes.items())
+    print(f"Context tokens: {detail} (full history {full} each, saved {saved})")
+    return sizes
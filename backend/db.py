@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+from catalog_db import db_path
+
+# Seconds a single query may run before SQLite interrupts it
+QUERY_TIMEOUT = float(os.getenv("DB_QUERY_TIMEOUT", "2.0"))
+
+# Per-connection page cache and memory-mapped I/O for the read-only catalog
+PRAGMAS = (
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Progress-handler granularity, in SQLite virtual machine instructions
+_PROGRESS_STEPS = 10000
+
+_local = threading.local()
+
+
+class QueryTimeoutError(sqlite3.OperationalError):
+    """Raised when a catalog query runs past its deadline."""
+
+
+def _connect(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, cached_statements=256)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    conn.set_progress_handler(_past_deadline, _PROGRESS_STEPS)
+    return conn
+
+
+def _past_deadline():
+    deadline = getattr(_local, "deadline", None)
+    return deadline is not None and time.monotonic() > deadline
+
+
+def get_connection(path=db_path):
+    """The calling thread's read-only catalog connection, opened on first use.
+
+    sqlite3 caches compiled statements per connection, so reusing one
+    connection per thread also reuses prepared statements across requests.
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _connect(path)
+    return conn
+
+
+def close_connections():
+    """Close this thread's connections, e.g. after the catalog database is rebuilt."""
+    for conn in getattr(_local, "conns", {}).values():
+        conn.close()
+    _local.conns = {}
+
+
+def _run(fn, timeout):
+    _local.deadline = time.monotonic() + timeout if timeout else None
+    try:
+        return fn()
+    except (sqlite3.OperationalError, pd.errors.DatabaseError) as e:
+        # pandas re-raises sqlite3 errors as its own DatabaseError
+        cause = e if isinstance(e, sqlite3.OperationalError) else e.__cause__
+        if isinstance(cause, sqlite3.OperationalError) and "interrupted" in str(cause):
+            raise QueryTimeoutError(f"Catalog query exceeded {timeout}s") from cause
+        raise
+    finally:
+        _local.deadline = None
+
+
+def query(sql, params=(), timeout=QUERY_TIMEOUT, path=db_path):
+    """Run a parameterized read query and return all rows."""
+    conn = get_connection(path)
+    return _run(lambda: conn.execute(sql, params).fetchall(), timeout)
+
+
+def query_one(sql, params=(), timeout=QUERY_TIMEOUT, path=db_path):
+    conn = get_connection(path)
+    return _run(lambda: conn.execute(sql, params).fetchone(), timeout)
+
+
+def query_df(sql, params=(), timeout=QUERY_TIMEOUT, path=db_path):
+    """Run a read query into a DataFrame; writes are rejected by ``query_only``."""
+    conn = get_connection(path)
+    return _run(lambda: pd.read_sql_query(sql, conn, params=params), timeout)
+
+
+def columns(sql, params=(), timeout=QUERY_TIMEOUT, path=db_path):
+    """Names of the columns ``sql`` returns, read from the cursor without fetching a row."""
+    conn = get_connection(path)
+    # Newline so a trailing -- comment cannot swallow the closing parenthesis
+    cursor = _run(lambda: conn.execute(f"SELECT * FROM ({sql}\n) LIMIT 0", params), timeout)
+    return [column[0] for column in cursor.description]
+
+
+def query_ids_df(sql, params=(), id_column="row_id", timeout=QUERY_TIMEOUT, path=db_path):
+    """``query_df`` reading only ``id_column`` when ``sql`` selects it, else every column."""
+    sql = sql.strip().rstrip(";")
+    if id_column in columns(sql, params, timeout, path):
+        sql = f'SELECT "{id_column}" FROM ({sql}\n)'
+    return query_df(sql, params, timeout, path)
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+
+# Upper bounds of the encode latency histogram, in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf"))
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, float("inf"))
+
+
+def _histogram(buckets):
+    return {"buckets": list(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+
+
+def _snapshot(histogram):
+    return {**histogram, "buckets": [str(bound) for bound in histogram["buckets"]], "counts": list(histogram["counts"])}
+
+
+def _observe(histogram, value):
+    for i, bound in enumerate(histogram["buckets"]):
+        if value <= bound:
+            histogram["counts"][i] += 1
+            break
+    histogram["sum"] += value
+    histogram["count"] += 1
+
+
+class CachedEmbeddings:
+    """LRU cache of query embeddings in front of an encoder.
+
+    Keys are the model id plus the query with whitespace collapsed, and
+    lowercased when the encoder's tokenizer is uncased anyway; the
+    normalized text is what gets encoded, so a hit and a miss return the
+    same vector. Concurrent misses are collected for ``batch_window``
+    seconds and encoded in one ``embed_documents`` call; identical
+    in-flight queries share one encode.
+    """
+
+    def __init__(self, embeddings, model_key, uncased=False, max_entries=4096,
+                 batch_window=0.002, max_batch=32):
+        self.embeddings = embeddings
+        self.model_key = model_key
+        self.uncased = uncased
+        self.max_entries = max_entries
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.hits = 0
+        self.misses = 0
+        self.latency = _histogram(LATENCY_BUCKETS_MS)
+        self.batch_sizes = _histogram(BATCH_SIZE_BUCKETS)
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._queue = []
+        self._encoding = False
+        self._lock = threading.Lock()
+
+    def normalize(self, text):
+        text = " ".join(text.split())
+        return text.lower() if self.uncased else text
+
+    def embed_query(self, text):
+        text = self.normalize(text)
+        key = (self.model_key, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+            future = self._pending.get(key)
+            lead = False
+            if future is None:
+                future = self._pending[key] = Future()
+                self._queue.append((key, text))
+                if not self._encoding:
+                    self._encoding = lead = True
+        if lead:
+            self._drain()
+        return future.result()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_many(self, texts):
+        """Vectors for ``texts`` in order, encoding every uncached one in a single batch.
+
+        Unlike ``embed_documents`` this does not wait for a batch window or
+        split at ``max_batch``: the caller already has the whole batch.
+        """
+        keys = [(self.model_key, self.normalize(text)) for text in texts]
+        vectors = {}
+        batch = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    vectors[key] = vector
+                    continue
+                self.misses += 1
+                future = self._pending.get(key)
+                if future is None:
+                    future = self._pending[key] = Future()
+                    batch.append((key, key[1]))
+                vectors[key] = future
+        if batch:
+            self._encode(batch)
+        return [vectors[key].result() if isinstance(vectors[key], Future) else vectors[key] for key in keys]
+
+    def _drain(self):
+        try:
+            # Give concurrent requests a moment to join this batch
+            time.sleep(self.batch_window)
+            while True:
+                with self._lock:
+                    batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+                    if not batch:
+                        self._encoding = False
+                        return
+                self._encode(batch)
+        except BaseException as e:
+            # Hand back the drain and fail what is queued, or later misses would wait forever
+            with self._lock:
+                self._encoding = False
+                queued, self._queue = self._queue, []
+                futures = [self._pending[key] for key, _ in queued]
+            self._fail(queued, futures, e)
+            raise
+
+    def _encode(self, batch):
+        with self._lock:
+            futures = [self._pending[key] for key, _ in batch]
+        try:
+            start = time.perf_counter()
+            try:
+                vectors = np.asarray(self.embeddings.embed_documents([text for _, text in batch]), dtype=np.float32)
+                if len(vectors) != len(batch):
+                    raise ValueError(f"Encoder returned {len(vectors)} vectors for {len(batch)} texts")
+            except Exception as e:
+                self._fail(batch, futures, e)
+                return
+            elapsed = (time.perf_counter() - start) * 1000
+            # One read-only row object per text, shared by the cache and the caller
+            vectors = list(vectors)
+
+            with self._lock:
+                _observe(self.latency, elapsed)
+                _observe(self.batch_sizes, len(batch))
+                for (key, _), vector in zip(batch, vectors):
+                    vector.setflags(write=False)
+                    self._entries[key] = vector
+                    del self._pending[key]
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            for future, vector in zip(futures, vectors):
+                future.set_result(vector)
+        finally:
+            # No-op once every future has its result
+            self._fail(batch, futures, RuntimeError("Query embedding failed"))
+
+    def _fail(self, batch, futures, error):
+        """Fail the futures of ``batch`` that have no result yet and stop tracking them."""
+        with self._lock:
+            for (key, _), future in zip(batch, futures):
+                if self._pending.get(key) is future:
+                    del self._pending[key]
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model": self.model_key,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": self.hits / lookups if lookups else 0.0,
+                "encodeLatencyMs": _snapshot(self.latency),
+                "batchSize": _snapshot(self.batch_sizes),
+            }
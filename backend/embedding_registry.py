@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+
+# Encoders a deployment can choose between with EMBEDDING_MODEL.
+# mpnet has better recall; MiniLM is about a third of the memory and latency.
+# "uncased" encoders lowercase their input, so query caches may too.
+EMBEDDING_MODELS = {
+    "mpnet": {"model_name": "sentence-transformers/all-mpnet-base-v2", "dimension": 768, "uncased": True},
+    "minilm": {"model_name": "sentence-transformers/all-MiniLM-L6-v2", "dimension": 384, "uncased": True},
+}
+
+DEFAULT_EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "minilm")
+
+# How the same weights are run on CPU, chosen with EMBEDDING_BACKEND:
+#   torch       fp32 PyTorch (reference)
+#   torch-int8  PyTorch with dynamic int8 quantization of the Linear layers
+#   onnx        ONNX Runtime, exported from the weights if the repo has no model.onnx
+#   onnx-int8   ONNX Runtime running the repo's int8-quantized export
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+DEFAULT_EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# The model repos also ship avx512, avx512_vnni and arm64 variants
+ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_qint8_avx2.onnx")
+
+_loaded_models = {}
+_load_lock = threading.Lock()
+
+
+class EmbeddingMismatchError(ValueError):
+    """Raised when an index was built by a different encoder than the one querying it."""
+
+
+def model_spec(model_key=None):
+    model_key = model_key or DEFAULT_EMBEDDING_MODEL
+    if model_key not in EMBEDDING_MODELS:
+        raise ValueError(
+            f"Unknown embedding model '{model_key}', expected one of {sorted(EMBEDDING_MODELS)}"
+        )
+    return {"key": model_key, **EMBEDDING_MODELS[model_key]}
+
+
+def _load_embeddings(model_name, backend):
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {list(EMBEDDING_BACKENDS)}")
+    if backend.startswith("onnx"):
+        model_kwargs = {"backend": "onnx", "model_kwargs": {"provider": "CPUExecutionProvider"}}
+        if backend == "onnx-int8":
+            model_kwargs["model_kwargs"]["file_name"] = ONNX_INT8_FILE
+        return HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs)
+
+    embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    if backend == "torch-int8":
+        import torch
+        torch.ao.quantization.quantize_dynamic(
+            embeddings._client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    return embeddings
+
+
+def get_embeddings(model_key=None, backend=None):
+    """Return the encoder for ``model_key`` on ``backend``, loading it at most once per process.
+
+    Every backend exposes the same ``embed_query``/``embed_documents`` calls.
+    """
+    spec = model_spec(model_key)
+    backend = backend or DEFAULT_EMBEDDING_BACKEND
+    with _load_lock:
+        if (spec["key"], backend) not in _loaded_models:
+            print(f"Loading embedding model {spec['model_name']} ({backend})")
+            _loaded_models[spec["key"], backend] = _load_embeddings(spec["model_name"], backend)
+        return _loaded_models[spec["key"], backend]
+
+
+def manifest_path(index_path):
+    return f"{index_path}.manifest.json"
+
+
+def write_manifest(index_path, model_key=None, backend=None, **extra):
+    """Record which encoder built the index stored at ``index_path``.
+
+    The backend is informational: all backends run the same weights and
+    agree closely enough to query each other's vectors.
+    """
+    spec = model_spec(model_key)
+    manifest = {
+        "model": spec["key"],
+        "model_name": spec["model_name"],
+        "dimension": spec["dimension"],
+        "backend": backend or DEFAULT_EMBEDDING_BACKEND,
+        **extra,
+    }
+    with open(manifest_path(index_path), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(index_path):
+    try:
+        with open(manifest_path(index_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def check_manifest(index_path, model_key=None, dimension=None):
+    """Raise EmbeddingMismatchError unless the index at ``index_path`` matches ``model_key``."""
+    spec = model_spec(model_key)
+    manifest = read_manifest(index_path)
+    if manifest is None:
+        raise EmbeddingMismatchError(f"{index_path} has no embedding manifest")
+    if manifest.get("model_name") != spec["model_name"]:
+        raise EmbeddingMismatchError(
+            f"{index_path} was built with {manifest.get('model_name')}, not {spec['model_name']}"
+        )
+    if manifest.get("dimension") != spec["dimension"] or (dimension is not None and dimension != spec["dimension"]):
+        raise EmbeddingMismatchError(
+            f"{index_path} has dimension {dimension or manifest.get('dimension')}, "
+            f"expected {spec['dimension']}"
+        )
+    return manifest
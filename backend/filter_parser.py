@@ -0,0 +1,304 @@
+import re
+from dataclasses import dataclass, field
+
+# Phrases users say for each catalog category; longer phrases win over shorter ones
+CATEGORY_SYNONYMS = {
+    "Bar furniture": ["bar furniture", "bar stool", "bar stools", "bar table", "bar tables", "bar chair", "bar chairs"],
+    "Beds": ["bed", "beds", "bed frame", "bed frames", "daybed", "day-bed", "bunk bed", "loft bed", "sofa-bed", "sofa bed"],
+    "Bookcases & shelving units": ["bookcase", "bookcases", "bookshelf", "bookshelves", "shelf", "shelves",
+                                   "shelving", "shelving unit", "shelving units", "book shelf"],
+    "Cabinets & cupboards": ["cabinet", "cabinets", "cupboard", "cupboards", "display cabinet", "glass-door cabinet"],
+    "Café furniture": ["café furniture", "cafe furniture", "café", "cafe", "bistro", "bistro table", "bistro set"],
+    "Chairs": ["chair", "chairs", "dining chair", "dining chairs", "office chair", "desk chair", "stool", "stools"],
+    "Chests of drawers & drawer units": ["chest of drawers", "chests of drawers", "dresser", "dressers",
+                                         "drawer unit", "drawer units", "drawers"],
+    "Children's furniture": ["children's furniture", "childrens furniture", "kids furniture", "kids", "kid's",
+                             "children", "child", "playroom"],
+    "Nursery furniture": ["nursery", "baby", "crib", "cot", "changing table", "cribs", "cots"],
+    "Outdoor furniture": ["outdoor furniture", "outdoor", "garden", "patio", "balcony", "terrace"],
+    "Room dividers": ["room divider", "room dividers", "divider", "dividers", "partition"],
+    "Sideboards, buffets & console tables": ["sideboard", "sideboards", "buffet", "buffets", "console table",
+                                             "console tables", "console"],
+    "Sofas & armchairs": ["sofa", "sofas", "couch", "couches", "armchair", "armchairs", "loveseat", "settee",
+                          "sectional", "chaise longue", "footstool", "recliner"],
+    "Tables & desks": ["table", "tables", "desk", "desks", "dining table", "dining tables", "coffee table",
+                       "coffee tables", "side table", "side tables", "writing desk", "gaming desk"],
+    "Trolleys": ["trolley", "trolleys", "cart", "carts", "kitchen trolley"],
+    "TV & media furniture": ["tv bench", "tv benches", "tv stand", "tv unit", "tv", "media furniture",
+                             "media unit", "entertainment center"],
+    "Wardrobes": ["wardrobe", "wardrobes", "closet", "closets", "armoire"],
+}
+
+# Words we cannot express as a filter; their presence sends the query to the LLM
+UNSUPPORTED_WORDS = {"not", "no", "without", "except", "excluding", "or", "unless", "instead"}
+
+DESIGNER_CUES = re.compile(r"\b(?:by|designer|designed|design by)\b", re.IGNORECASE)
+
+_NUM = r"(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)(?![\d,])"
+_CURRENCY_WORDS = r"\$|€|(?<![a-z])(?:sar|sr|usd|eur|dollars?|riyals?|euros?)(?![a-z])"
+_CURRENCY = rf"(?:{_CURRENCY_WORDS})?"
+# A number is only a price next to one of these: "up to 4 people" is not a budget
+_PRICE_CUE = re.compile(rf"{_CURRENCY_WORDS}|\b(?:budget|price[ds]?|cost(?:s|ing)?|spend)\b", re.I)
+# Things people count; a number in front of one is never a price or a size
+_COUNT_NOUN = re.compile(
+    r"\s*(?:-\s*)?(?:people|persons?|guests?|adults?|kids|children|seats?|seaters?|drawers?|doors?|"
+    r"shelves|shelf|compartments?|pieces?|pcs|items?|sets?|days?|weeks?|months?|years?|hours?)\b",
+    re.I,
+)
+_UNIT = r"(cm|centimet(?:er|re)s?|mm|millimet(?:er|re)s?|m|met(?:er|re)s?|inch(?:es)?|\"|'')"
+_DIMENSION_WORDS = {
+    "wide": "width", "width": "width", "long": "width", "length": "width", "across": "width",
+    "deep": "depth", "depth": "depth",
+    "tall": "height", "high": "height", "height": "height",
+}
+_DIM = r"(wide|width|long|length|across|deep|depth|tall|high|height)"
+_AT_LEAST = r"(?<!no )(?:at least|min(?:imum)?|over|more than|greater than|bigger than|larger than|wider than|taller than|deeper than|above|>=?)"
+_AT_MOST = r"(?:at most|max(?:imum)?|under|below|less than|no more than|up to|smaller than|narrower than|shorter than|within|<=?)"
+
+_DIMENSION_PATTERNS = [
+    # between 100 and 150 cm wide
+    (re.compile(rf"\bbetween\s+{_NUM}\s*{_UNIT}?\s*(?:and|-|to)\s+{_NUM}\s*{_UNIT}\s*{_DIM}\b", re.I), "range"),
+    # at least 120cm wide / under 2 m tall
+    (re.compile(rf"(?<!\w){_AT_MOST}\s*{_NUM}\s*{_UNIT}\s*{_DIM}\b", re.I), "max"),
+    (re.compile(rf"(?<!\w){_AT_LEAST}\s*{_NUM}\s*{_UNIT}\s*{_DIM}\b", re.I), "min"),
+    # width of at least 120cm / height under 90 cm
+    (re.compile(rf"\b{_DIM}\s*(?:of\s+)?{_AT_MOST}\s*{_NUM}\s*{_UNIT}", re.I), "max_dim_first"),
+    (re.compile(rf"\b{_DIM}\s*(?:of\s+)?{_AT_LEAST}\s*{_NUM}\s*{_UNIT}", re.I), "min_dim_first"),
+    # 120cm wide / width of 120 cm
+    (re.compile(rf"(?<![\w.]){_NUM}\s*{_UNIT}\s*{_DIM}\b", re.I), "about"),
+    (re.compile(rf"\b{_DIM}\s*(?:of|:|=)?\s*{_NUM}\s*{_UNIT}", re.I), "about_dim_first"),
+]
+
+_PRICE_PATTERNS = [
+    (re.compile(rf"\bbetween\s+{_CURRENCY}\s*{_NUM}\s*{_CURRENCY}\s*(?:and|-|to)\s+{_CURRENCY}\s*{_NUM}\s*{_CURRENCY}", re.I), "range"),
+    (re.compile(rf"(?<![\w.]){_CURRENCY}\s*{_NUM}\s*{_CURRENCY}\s*(?:-|to)\s*{_CURRENCY}\s*{_NUM}\s*{_CURRENCY}(?!\s*{_UNIT}\b)", re.I), "range"),
+    (re.compile(rf"(?:\b(?:budget(?: of| is)?|cost(?:ing)?|price(?:d)?)\s+{_AT_MOST}?|(?<!\w){_AT_MOST})\s*{_CURRENCY}\s*{_NUM}\s*{_CURRENCY}(?!\s*{_UNIT}\b)", re.I), "max"),
+    (re.compile(rf"(?<!\w){_AT_LEAST}\s*{_CURRENCY}\s*{_NUM}\s*{_CURRENCY}(?!\s*{_UNIT}\b)", re.I), "min"),
+    (re.compile(rf"(?<![\w.]){_NUM}\s*{_CURRENCY}\s*budget\b", re.I), "max"),
+    (re.compile(rf"(?:\$|€|\bsar\s*|\bsr\s*){_NUM}(?!\s*{_UNIT}\b)", re.I), "max"),
+    (re.compile(rf"(?<![\w.]){_NUM}\s*(?:€|(?:sar|sr|usd|eur|dollars?|riyals?|euros?)\b)", re.I), "max"),
+]
+
+# Tolerance for a bare size such as "120cm wide"
+_ABOUT_TOLERANCE = 0.1
+
+
+def _number(text):
+    return float(text.replace(",", ""))
+
+
+def _to_cm(value, unit):
+    unit = (unit or "cm").lower()
+    if unit.startswith("mm") or unit.startswith("milli"):
+        return value / 10
+    if unit in ("m",) or unit.startswith("met"):
+        return value * 100
+    if unit in ('"', "''") or unit.startswith("inch"):
+        return value * 2.54
+    return value
+
+
+@dataclass
+class ParsedFilters:
+    """Structured filters extracted from a chat message without calling the LLM."""
+
+    categories: list = field(default_factory=list)
+    min_price: float = None
+    max_price: float = None
+    dimensions: dict = field(default_factory=dict)  # column -> [min_cm, max_cm]
+    designers: list = field(default_factory=list)
+    confident: bool = False
+    reason: str = ""
+
+    def is_empty(self):
+        return not (self.categories or self.designers or self.dimensions
+                    or self.min_price is not None or self.max_price is not None)
+
+    def merge(self, newer):
+        """Combine with filters from a later message; the later message wins per field."""
+        merged = ParsedFilters(
+            categories=newer.categories or self.categories,
+            min_price=newer.min_price if newer.min_price is not None else self.min_price,
+            max_price=newer.max_price if newer.max_price is not None else self.max_price,
+            dimensions={**self.dimensions, **newer.dimensions},
+            designers=newer.designers or self.designers,
+            confident=newer.confident,
+            reason=newer.reason,
+        )
+        return merged
+
+    def describe(self):
+        """Human-readable summary of the filters, e.g. for an LLM prompt."""
+        parts = []
+        if self.categories:
+            parts.append(f"category {' or '.join(self.categories)}")
+        if self.min_price is not None:
+            parts.append(f"price >= {self.min_price:g}")
+        if self.max_price is not None:
+            parts.append(f"price <= {self.max_price:g}")
+        for column, (low, high) in sorted(self.dimensions.items()):
+            if low is not None:
+                parts.append(f"{column} >= {low:g}cm")
+            if high is not None:
+                parts.append(f"{column} <= {high:g}cm")
+        if self.designers:
+            parts.append(f"designer {' or '.join(self.designers)}")
+        return "; ".join(parts)
+
+    def to_sql(self, columns="row_id"):
+        """Parameterized ``(sql, params)`` selecting the matching catalog rows."""
+        clauses, params = [], []
+        if self.categories:
+            clauses.append(f"category IN ({', '.join('?' for _ in self.categories)})")
+            params.extend(self.categories)
+        if self.min_price is not None:
+            clauses.append("price >= ?")
+            params.append(self.min_price)
+        if self.max_price is not None:
+            clauses.append("price <= ?")
+            params.append(self.max_price)
+        for column, (low, high) in sorted(self.dimensions.items()):
+            if low is not None:
+                clauses.append(f"{column} >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append(f"{column} <= ?")
+                params.append(high)
+        if self.designers:
+            clauses.append("(" + " OR ".join("designer LIKE ?" for _ in self.designers) + ")")
+            params.extend(f"%{name}%" for name in self.designers)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return f"SELECT {columns} FROM furniture{where}", params
+
+
+class FilterParser:
+    """Rule-based extractor for the filters the SQL-generating LLM is usually asked for.
+
+    Handles budgets ("under $500", "budget of 500"), dimension bounds ("at least 120cm wide"),
+    category synonyms and designer surnames. A number is only read as a price
+    next to a currency or budget word. A parse is only ``confident`` when
+    every number in the message was understood and nothing in it needs
+    negation or alternatives; otherwise the caller should ask the LLM.
+    """
+
+    def __init__(self, categories=None, designers=()):
+        known = set(categories) if categories is not None else set(CATEGORY_SYNONYMS)
+        phrases = [
+            (phrase, category)
+            for category, synonyms in CATEGORY_SYNONYMS.items() if category in known
+            for phrase in synonyms + [category.lower()]
+        ]
+        phrases.sort(key=lambda item: len(item[0]), reverse=True)
+        self._category_phrases = [
+            (re.compile(rf"(?<!\w){re.escape(phrase)}(?!\w)", re.IGNORECASE), category)
+            for phrase, category in phrases
+        ]
+        self._designer_names = self._designer_lexicon(designers)
+
+    @staticmethod
+    def _designer_lexicon(designers):
+        """Map lowercased designer surnames to their catalog spelling."""
+        names = {}
+        for value in designers:
+            if not isinstance(value, str) or len(value) > 80:
+                continue
+            for part in value.split("/"):
+                tokens = part.strip().split()
+                if not 2 <= len(tokens) <= 4 or part.strip() == "IKEA of Sweden":
+                    continue
+                surname = tokens[-1]
+                if len(surname) >= 4 and surname.isalpha() and surname[0].isupper():
+                    names[surname.lower()] = surname
+        return names
+
+    def parse(self, text):
+        filters = ParsedFilters()
+        remaining = text
+
+        def consume(match):
+            nonlocal remaining
+            start, end = match.span()
+            remaining = remaining[:start] + " " * (end - start) + remaining[end:]
+
+        for pattern, kind in _DIMENSION_PATTERNS:
+            for match in list(pattern.finditer(remaining)):
+                self._apply_dimension(filters, kind, match.groups())
+                consume(match)
+
+        for pattern, kind in _PRICE_PATTERNS:
+            for match in list(pattern.finditer(remaining)):
+                # Without a currency or budget word, or with a count after it, the number is not a price
+                if not _PRICE_CUE.search(match.group(0)) or _COUNT_NOUN.match(remaining, match.end()):
+                    continue
+                values = [_number(group) for group in match.groups() if group]
+                if kind == "range":
+                    filters.min_price, filters.max_price = min(values), max(values)
+                elif kind == "max":
+                    filters.max_price = values[0]
+                else:
+                    filters.min_price = values[0]
+                consume(match)
+
+        # Before categories take "drawers" or "shelves" out of the text
+        counts = [match.group(1).lower() for match in re.finditer(r"\d\s*(?:-\s*)?([a-z]+)", remaining, re.I)
+                  if _COUNT_NOUN.fullmatch(" " + match.group(1))]
+
+        for pattern, category in self._category_phrases:
+            for match in list(pattern.finditer(remaining)):
+                if category not in filters.categories:
+                    filters.categories.append(category)
+                consume(match)
+
+        if DESIGNER_CUES.search(remaining):
+            for word in re.findall(r"[^\W\d_]+", remaining):
+                name = self._designer_names.get(word.lower())
+                if name and name not in filters.designers:
+                    filters.designers.append(name)
+
+        leftover_numbers = re.findall(r"\d", remaining)
+        words = set(re.findall(r"[a-z']+", remaining.lower()))
+        if counts:
+            filters.reason = f"counted {', '.join(counts)}, not a price or size"
+        elif leftover_numbers:
+            filters.reason = "unparsed numbers"
+        elif words & UNSUPPORTED_WORDS:
+            filters.reason = f"unsupported wording: {', '.join(sorted(words & UNSUPPORTED_WORDS))}"
+        elif filters.is_empty():
+            filters.reason = "no filters found"
+        else:
+            filters.confident = True
+        return filters
+
+    def parse_conversation(self, text, previous_queries=()):
+        """Parse ``text`` on top of the filters implied by earlier user messages."""
+        filters = ParsedFilters()
+        for query in previous_queries:
+            parsed = self.parse(query)
+            if parsed.confident:
+                filters = filters.merge(parsed)
+        return filters.merge(self.parse(text))
+
+    @staticmethod
+    def _apply_dimension(filters, kind, groups):
+        if kind == "range":
+            low, low_unit, high, unit, word = groups
+            low, high = _to_cm(_number(low), low_unit or unit), _to_cm(_number(high), unit)
+            bounds = [min(low, high), max(low, high)]
+        else:
+            if kind.endswith("dim_first"):
+                word, value, unit = groups
+            else:
+                value, unit, word = groups
+            value = _to_cm(_number(value), unit)
+            if kind.startswith("min"):
+                bounds = [value, None]
+            elif kind.startswith("max"):
+                bounds = [None, value]
+            else:
+                bounds = [value * (1 - _ABOUT_TOLERANCE), value * (1 + _ABOUT_TOLERANCE)]
+        column = _DIMENSION_WORDS[word.lower()]
+        current = filters.dimensions.get(column, [None, None])
+        filters.dimensions[column] = [
+            bounds[0] if bounds[0] is not None else current[0],
+            bounds[1] if bounds[1] is not None else current[1],
+        ]
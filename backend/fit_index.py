@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+SORT_ORDERS = ("price", "fit")
+
+
+class FitIndex:
+    """Measured catalog items arranged for "what fits here" queries.
+
+    Items are stored in arrays sorted by their longer footprint side, so a
+    query binary-searches that side and filters the remaining prefix on the
+    shorter side and the height with one vectorized mask. Comparing short
+    side to short side and long to long accepts items in either orientation.
+    Dimensions are in centimetres, like the catalog.
+    """
+
+    def __init__(self, df):
+        measured = df.dropna(subset=["width", "depth", "height"])
+        width = measured["width"].to_numpy(dtype=np.float64)
+        depth = measured["depth"].to_numpy(dtype=np.float64)
+        long_side = np.maximum(width, depth)
+        order = np.argsort(long_side, kind="stable")
+
+        self.long_side = long_side[order]
+        self.short_side = np.minimum(width, depth)[order]
+        self.width = width[order]
+        self.depth = depth[order]
+        self.height = measured["height"].to_numpy(dtype=np.float64)[order]
+        self.price = measured["price"].to_numpy(dtype=np.float64)[order]
+        self.row_ids = measured.index.to_numpy(dtype=np.int64)[order]
+        name_codes, self.unique_names = pd.factorize(measured["name"])
+        self.name_codes = name_codes[order]
+        codes, self.category_names = pd.factorize(measured["category"])
+        self.category_codes = codes[order]
+        self._category_code = {category: code for code, category in enumerate(self.category_names)}
+        self.descriptions = measured["short_description"].to_numpy(dtype=object)[order]
+        area = self.long_side * self.short_side
+        self._orders = {
+            "price": np.argsort(self.price, kind="stable"),
+            "fit": np.argsort(-area, kind="stable"),
+            "volume": np.argsort(-area * self.height, kind="stable"),
+        }
+        self._ranks = {}
+        for key, order in self._orders.items():
+            self._ranks[key] = np.empty(len(order), dtype=np.int64)
+            self._ranks[key][order] = np.arange(len(order))
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def _mask(self, width, depth, height, category, max_price, clearance):
+        """Fit flags for the positions before ``end``; every later item is too long."""
+        room_long = max(width, depth) - 2 * clearance
+        room_short = min(width, depth) - 2 * clearance
+        end = np.searchsorted(self.long_side, room_long, side="right")
+        mask = self.short_side[:end] <= room_short
+        if height is not None:
+            mask &= self.height[:end] <= height
+        if category is not None:
+            mask &= self.category_codes[:end] == self._category_code.get(category, -2)
+        if max_price is not None:
+            mask &= self.price[:end] <= max_price
+        return end, mask
+
+    def fits(self, width, depth, height=None, category=None, max_price=None, clearance=0.0):
+        """Positions of items whose footprint fits a ``width`` x ``depth`` area, in either orientation.
+
+        ``height`` bounds item height when given; ``clearance`` is kept free
+        on every side of the item.
+        """
+        _, mask = self._mask(width, depth, height, category, max_price, clearance)
+        return np.flatnonzero(mask)
+
+    def query(self, width, depth, height=None, category=None, max_price=None, clearance=0.0,
+              sort="price", limit=20):
+        """Items that fit the area, cheapest first or closest fit first, one per name.
+
+        The closest fit fills the largest share of the area (or of the volume
+        when ``height`` is given); that share only scales the item's own area
+        or volume, so both orders are precomputed and a query walks one of
+        them until it has ``limit`` distinct names.
+        """
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_ORDERS)}")
+        end, mask = self._mask(width, depth, height, category, max_price, clearance)
+        total = int(np.count_nonzero(mask))
+        key = "volume" if sort == "fit" and height else sort
+        if total * 4 < len(self.row_ids):
+            # Few items fit: rank just those instead of walking the whole order
+            positions = np.flatnonzero(mask)
+            order = positions[np.argsort(self._ranks[key][positions])]
+            fitting = None
+        else:
+            order = self._orders[key]
+            fitting = np.zeros(len(self.row_ids), dtype=bool)
+            fitting[:end] = mask
+
+        best = []
+        seen = set()
+        start, chunk = 0, max(limit * 4, 64)
+        while start < len(order) and len(best) < limit:
+            candidates = order[start:start + chunk]
+            if fitting is not None:
+                candidates = candidates[fitting[candidates]]
+            start, chunk = start + chunk, chunk * 2
+            # First (best ranked) position of each name within the chunk
+            _, first = np.unique(self.name_codes[candidates], return_index=True)
+            for pos in candidates[np.sort(first)]:
+                if self.name_codes[pos] not in seen:
+                    seen.add(self.name_codes[pos])
+                    best.append(pos)
+                    if len(best) >= limit:
+                        break
+        items = [self._item(pos, width, depth, clearance) for pos in best]
+        return {"items": items, "total": total}
+
+    def _item(self, pos, width, depth, clearance):
+        # Rotated when the item only fits with its width along the area's depth
+        rotated = bool(self.width[pos] > width - 2 * clearance or self.depth[pos] > depth - 2 * clearance)
+        price = self.price[pos]
+        return {
+            "rowId": int(self.row_ids[pos]),
+            "name": self.unique_names[self.name_codes[pos]],
+            "category": self.category_names[self.category_codes[pos]],
+            "description": self.descriptions[pos],
+            "width": float(self.width[pos]),
+            "depth": float(self.depth[pos]),
+            "height": float(self.height[pos]),
+            "price": None if np.isnan(price) else float(price),
+            "rotated": rotated,
+        }
+
+
+def parse_region(region):
+    """(width, depth, height) of one requested area; raises ValueError on bad input."""
+    try:
+        width = float(region["width"])
+        depth = float(region["depth"])
+        height = float(region["height"]) if region.get("height") is not None else None
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Each region needs numeric width and depth (and optional height) in cm")
+    if width <= 0 or depth <= 0 or (height is not None and height <= 0):
+        raise ValueError("Region dimensions must be positive")
+    return width, depth, height
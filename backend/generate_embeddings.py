@@ -1,63 +1,156 @@
+import argparse
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+from embedding_registry import (
+    DEFAULT_EMBEDDING_MODEL,
+    EMBEDDING_BACKENDS,
+    EmbeddingMismatchError,
+    check_manifest,
+    get_embeddings,
+    manifest_path,
+    model_spec,
+    write_manifest,
+)
+from vector_index import CatalogVectorIndex, normalize_rows
 
 csv_file = "IKEA_SA_Furniture_Web_Scrapings_sss.csv"
-df = pd.read_csv(csv_file)
+index_path = os.getenv("CATALOG_VECTORS_PATH", "catalog_vectors.npy")
 
-def create_detailed_description(row):
+def create_detailed_descriptions(df):
+    """Build the text embedded for each catalog row, column-wise over the whole frame."""
     # Handle price information
-    if pd.isnull(row['price']):
-        price_info = "Price not available"
-    else:
-        price_info = f"Price: ${row['price']}"
-        if pd.notnull(row['old_price']) and row['old_price'] != "No old price":
-            price_info += f" (Was ${row['old_price']})"
+    price_info = ("Price: $" + df['price'].astype(str)).where(df['price'].notna(), "Price not available")
+    has_old_price = df['old_price'].notna() & (df['old_price'] != "No old price")
+    price_info = price_info.where(
+        ~has_old_price | df['price'].isna(),
+        price_info + " (Was $" + df['old_price'].astype(str) + ")"
+    )
 
     # Handle dimensions
-    dimensions = []
-    if pd.notnull(row['depth']):
-        dimensions.append(f"Depth: {row['depth']}cm")
-    if pd.notnull(row['height']):
-        dimensions.append(f"Height: {row['height']}cm")
-    if pd.notnull(row['width']):
-        dimensions.append(f"Width: {row['width']}cm")
-    dimensions_str = " | ".join(dimensions) if dimensions else "Dimensions not specified"
+    dimensions = pd.concat(
+        [
+            (f"{label}: " + df[column].astype(str) + "cm").where(df[column].notna())
+            for label, column in (("Depth", "depth"), ("Height", "height"), ("Width", "width"))
+        ],
+        axis=1,
+    )
+    dimensions_str = (
+        dimensions.stack().dropna().groupby(level=0).agg(" | ".join)
+        .reindex(df.index).fillna("Dimensions not specified")
+    )
 
     # Handle availability
-    availability = "Available online" if row['sellable_online'] else "Not available online"
-    if row['other_colors'] == "Yes":
-        availability += " | Available in other colors"
+    availability = pd.Series(
+        np.where(df['sellable_online'].astype(bool), "Available online", "Not available online"),
+        index=df.index
+    ) + np.where(df['other_colors'] == "Yes", " | Available in other colors", "")
 
     # Handle designer information
-    designer_info = f"Designed by {row['designer']}" if pd.notnull(row['designer']) else ""
+    designer_info = ("Designed by " + df['designer'].astype(str)).where(df['designer'].notna(), "")
 
     description = (
-        f"{row['name']} - {row['category']}\n"
-        f"{row['short_description']}\n"
-        f"{price_info}\n"
-        f"{dimensions_str}\n"
-        f"{availability}\n"
-        f"{designer_info}"
+        df['name'].fillna('').astype(str) + " - " + df['category'].fillna('').astype(str) + "\n"
+        + df['short_description'].fillna('').astype(str) + "\n"
+        + price_info + "\n"
+        + dimensions_str + "\n"
+        + availability + "\n"
+        + designer_info
     )
-    return description.strip()
+    return description.str.strip()
+
+def description_hashes(texts):
+    """Fingerprint each description so unchanged rows keep their vectors."""
+    return np.array(
+        [hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest() for text in texts],
+        dtype="S16"
+    )
+
+def _reusable_index(path, model_key):
+    """The index on disk if ``model_key`` built it, otherwise None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        index = CatalogVectorIndex.load(path)
+        check_manifest(path, model_key, dimension=index.dimension)
+        return index
+    except (EmbeddingMismatchError, OSError, KeyError, ValueError) as e:
+        print(f"Not reusing catalog vectors at {path}: {e}")
+        # Drop the manifest first so a half-written rebuild is never trusted
+        if os.path.exists(manifest_path(path)):
+            os.remove(manifest_path(path))
+        return None
+
+def _save_progress(path, model_key, backend, ids, vectors, hashes, done):
+    CatalogVectorIndex(ids[done], vectors[done], hashes[done]).save(path)
+    write_manifest(path, model_key, backend, rows=int(done.sum()))
+
+def build_catalog_index(df, model_key=DEFAULT_EMBEDDING_MODEL, path=index_path,
+                        batch_size=64, workers=1, checkpoint_every=20, backend=None):
+    """Embed new or changed catalog rows and save the float16 matrix with its manifest.
+
+    Rows whose description hash matches the index already on disk keep their
+    vectors. Progress is checkpointed every ``checkpoint_every`` batches, so an
+    interrupted build resumes where it stopped.
+    """
+    texts = create_detailed_descriptions(df).sort_index()
+    ids = texts.index.to_numpy(dtype=np.int64)
+    hashes = description_hashes(texts)
+    vectors = np.zeros((len(ids), model_spec(model_key)["dimension"]), dtype=np.float16)
+    done = np.zeros(len(ids), dtype=bool)
+
+    previous = _reusable_index(path, model_key)
+    if previous is not None and previous.hashes is not None:
+        pos = previous.lookup(ids)
+        known = pos >= 0
+        done[known] = previous.hashes[pos[known]] == hashes[known]
+        vectors[done] = previous.vectors[pos[done]]
+        del previous
+
+    todo = np.flatnonzero(~done)
+    print(f"Reusing {int(done.sum())} catalog vectors, embedding {len(todo)} rows")
+    if len(todo):
+        embeddings = get_embeddings(model_key, backend)
+        batches = [todo[start:start + batch_size] for start in range(0, len(todo), batch_size)]
 
-# Create the detailed description column
-df["description"] = df.apply(create_detailed_description, axis=1)
+        def embed_batch(batch):
+            return embeddings.embed_documents(texts.iloc[batch].tolist())
 
-# Clean up price data
-df['price'] = pd.to_numeric(df['price'], errors='coerce')
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for n, (batch, batch_vectors) in enumerate(zip(batches, pool.map(embed_batch, batches)), 1):
+                vectors[batch] = normalize_rows(batch_vectors)
+                done[batch] = True
+                if n % checkpoint_every == 0 and n < len(batches):
+                    _save_progress(path, model_key, backend, ids, vectors, hashes, done)
+                    print(f"Checkpointed {int(done.sum())}/{len(ids)} catalog vectors")
 
-# Initialize embeddings
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
+    _save_progress(path, model_key, backend, ids, vectors, hashes, done)
+    return CatalogVectorIndex.load(path)
 
-# Prepare data for vector store
-texts = df["description"].tolist()
-metadata = df.drop(columns=["description"]).to_dict(orient="records")
-ids = df.index.astype(str).tolist()
+def load_catalog_index(df, model_key=DEFAULT_EMBEDDING_MODEL, path=index_path):
+    """Memory-map the saved matrix, re-embedding only rows that changed since it was built."""
+    index = _reusable_index(path, model_key)
+    if index is not None:
+        texts = create_detailed_descriptions(df)
+        if index.matches(texts.index, description_hashes(texts)):
+            return index
+        print(f"Catalog vectors at {path} are out of date, updating")
+    return build_catalog_index(df, model_key, path)
 
-# Create and save vector store
-vectorstore = FAISS.from_texts(texts, embeddings, metadatas=metadata, ids=ids)
-vectorstore.save_local("faiss_furniture_index")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the catalog embedding matrix.")
+    parser.add_argument("--csv", default=csv_file, help="catalog CSV to embed")
+    parser.add_argument("--out", default=index_path, help="float16 .npy matrix to write")
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL, help="embedding model key")
+    parser.add_argument("--batch-size", type=int, default=64, help="rows per encoder call")
+    parser.add_argument("--workers", type=int, default=1, help="concurrent encoder calls")
+    parser.add_argument("--backend", default=None, choices=EMBEDDING_BACKENDS,
+                        help="encoder runtime (default: EMBEDDING_BACKEND or torch)")
+    args = parser.parse_args()
 
-print("Embeddings generated and saved successfully!")
\ No newline at end of file
+    df = pd.read_csv(args.csv, index_col=0)
+    build_catalog_index(df, args.model, args.out, batch_size=args.batch_size, workers=args.workers,
+                        backend=args.backend)
+    print("Embeddings generated and saved successfully!")
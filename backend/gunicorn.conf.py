@@ -0,0 +1,50 @@
+"""gunicorn settings for serving wsgi:app.
+
+The app is preloaded in the master so the encoder weights, vector index and
+catalog frames are loaded once and shared by every worker. Each worker warms
+up in the background after the fork and reports ready on ``/api/ready``.
+Set GUNICORN_PRELOAD=0 to load the app in each worker instead.
+
+Workers do not share memory after the fork, and a chat's follow-up can land
+on any of them, so with more than one worker SESSION_BACKEND defaults to
+``sqlite`` (one session database shared by all workers). Setting
+SESSION_BACKEND=memory there loses history whenever a turn changes worker.
+"""
+import gc
+import multiprocessing
+import os
+import sys
+import threading
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+# Threads per worker let concurrent chat turns share an encoder batch and overlap LLM calls
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+# LLM calls can take tens of seconds
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Read when main is imported, which happens after this file is loaded
+if workers > 1:
+    os.environ.setdefault("SESSION_BACKEND", "sqlite")
+    if os.environ["SESSION_BACKEND"] == "memory":
+        print(f"SESSION_BACKEND=memory with {workers} workers: chat history is per worker")
+
+# One encoder thread pool per worker, not one per core per worker; must be set before torch loads
+os.environ.setdefault("OMP_NUM_THREADS", str(max(1, multiprocessing.cpu_count() // workers)))
+
+
+def when_ready(server):
+    # Runs in the master after preloading and before the first fork
+    main = sys.modules.get("main")
+    if main is not None:
+        main.before_fork()
+    # Keep the collector from touching (and so copying) the preloaded objects in every worker
+    gc.collect()
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    import main
+    threading.Thread(target=main.warm_up, name="warm-up", daemon=True).start()
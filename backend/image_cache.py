@@ -0,0 +1,245 @@
+import atexit
+import fcntl
+import io
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+from PIL import Image
+
+# Bits that may differ between two dHashes of the same photo after
+# recompression or resizing; unrelated photos differ in ~32 of 64
+MAX_DISTANCE = int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", "6"))
+# Largest change in any cell of the colour grid between two encodings of the same photo;
+# re-encoding and resizing move cells by ~5 levels
+MAX_COLOR_DIFF = int(os.getenv("IMAGE_CACHE_MAX_COLOR_DIFF", "10"))
+# Puts within this many seconds are written to disk together
+FLUSH_INTERVAL = float(os.getenv("IMAGE_CACHE_FLUSH_SECONDS", "5"))
+
+
+def dhash(data, size=8):
+    """64-bit difference hash of encoded image bytes.
+
+    The image is shrunk to (size + 1) x size grey pixels and each bit records
+    whether a pixel is brighter than its right-hand neighbour, so the hash
+    survives re-encoding, resizing and small color shifts.
+    """
+    image = Image.open(io.BytesIO(data))
+    if image.format == "JPEG":
+        image.draft("L", (size * 8, size * 8))
+    return _dhash(image.convert("L"), size)
+
+
+def _dhash(grey, size):
+    pixels = np.asarray(grey.resize((size + 1, size), Image.Resampling.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def fingerprint(data, size=8, grid=4):
+    """``(dhash, colors)`` of encoded image bytes from a single decode.
+
+    ``colors`` is the mean RGB of each cell of a ``grid`` x ``grid`` layout.
+    A dHash only records which way brightness changes, so every solid
+    colour hashes to zero and products on a white background land a few
+    bits apart; the colours tell such images apart.
+    """
+    image = Image.open(io.BytesIO(data))
+    if image.format == "JPEG":
+        image.draft("RGB", (size * 8, size * 8))
+    image = image.convert("RGB")
+    colors = np.asarray(image.resize((grid, grid), Image.Resampling.BOX), dtype=np.uint8)
+    return _dhash(image.convert("L"), size), colors.ravel().tolist()
+
+
+def _close(colors, other, max_diff):
+    """True when two colour grids differ by at most ``max_diff`` in every value."""
+    return (colors is not None and other is not None and len(colors) == len(other)
+            and max(abs(a - b) for a, b in zip(colors, other)) <= max_diff)
+
+
+def hamming_distances(hashes, value):
+    """Number of differing bits between each hash in ``hashes`` and ``value``."""
+    diff = np.bitwise_xor(hashes, np.uint64(value))
+    return np.unpackbits(diff.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class PerceptualImageCache:
+    """Image analysis results keyed by perceptual hash, persisted to a JSON file.
+
+    Each entry holds independent layers, e.g. the Vision annotations for a
+    feature set and the LLM result built from them, so a re-upload can skip
+    Vision alone when only the prompt changed. A lookup matches the nearest
+    stored hash within ``max_distance`` bits that has the requested layer
+    and, when ``colors`` from ``fingerprint`` are given, whose colour grid
+    is within ``max_color_diff`` in every cell. Entries stored without
+    colours never match a lookup that has them. The least recently used
+    images are evicted past ``max_entries``.
+
+    Puts are written to disk at most every ``flush_interval`` seconds by a
+    background timer, and once more at exit. A flush merges in whatever other
+    workers wrote since, under an exclusive lock on ``<path>.lock``, and
+    replaces the file atomically, so workers sharing the file never lose each
+    other's entries or see a partial write.
+    """
+
+    def __init__(self, path="image_cache.json", max_entries=2048, max_distance=MAX_DISTANCE,
+                 max_color_diff=MAX_COLOR_DIFF, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.max_color_diff = max_color_diff
+        self.flush_interval = flush_interval
+        self.counters = {}
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._colors = {}
+        self._keys = None
+        self._hashes = None
+        self._dirty = False
+        self._timer = None
+        self._lock = threading.Lock()
+        for key, layers, colors in self._read()[-self.max_entries:]:
+            self._entries[key] = layers
+            if colors is not None:
+                self._colors[key] = colors
+        if self._entries:
+            print(f"Loaded {len(self._entries)} cached image analyses from {self.path}")
+        if self.path:
+            atexit.register(self.flush)
+
+    def _read(self):
+        """``(hash, layers, colors)`` stored at ``path``, oldest first."""
+        if not self.path or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable image cache {self.path}: {e}")
+            return []
+        return [(int(entry["hash"], 16), entry["layers"], entry.get("colors"))
+                for entry in stored.get("entries", [])]
+
+    def _write(self, entries, colors):
+        # A temporary file of its own per write, in the same directory so the rename is atomic
+        f = tempfile.NamedTemporaryFile("w", dir=os.path.dirname(os.path.abspath(self.path)),
+                                        prefix=".image_cache.", suffix=".tmp", delete=False)
+        try:
+            with f:
+                json.dump({"entries": [{"hash": f"{key:016x}", "layers": layers, "colors": colors.get(key)}
+                                       for key, layers in entries.items()]}, f)
+            # mkstemp creates the file 0600; keep the mode a plain open() would give
+            os.chmod(f.name, 0o644)
+            os.replace(f.name, self.path)
+        except BaseException:
+            os.unlink(f.name)
+            raise
+
+    def _schedule_flush(self):
+        # Caller holds self._lock
+        self._dirty = True
+        if self.path and self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Merge this process's entries into the file on disk, if any changed."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty or not self.path:
+                return
+            self._dirty = False
+            snapshot = [(key, dict(layers), self._colors.get(key)) for key, layers in self._entries.items()]
+        try:
+            with open(f"{self.path}.lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                stored = self._read()
+                merged = OrderedDict((key, layers) for key, layers, _ in stored)
+                colors = {key: colors for key, _, colors in stored if colors is not None}
+                for key, layers, key_colors in snapshot:
+                    stored_layers = merged.pop(key, {})
+                    if key_colors is not None:
+                        if not _close(colors.get(key), key_colors, self.max_color_diff):
+                            # Another worker's image with the same hash; ours is newer
+                            stored_layers = {}
+                        colors[key] = key_colors
+                    merged[key] = {**stored_layers, **layers}
+                while len(merged) > self.max_entries:
+                    colors.pop(merged.popitem(last=False)[0], None)
+                self._write(merged, colors)
+        except OSError as e:
+            print(f"Could not persist image cache: {e}")
+            with self._lock:
+                self._schedule_flush()
+
+    def _matches(self, key, layer, colors):
+        if layer is not None and layer not in self._entries[key]:
+            return False
+        return colors is None or _close(self._colors.get(key), colors, self.max_color_diff)
+
+    def _nearest(self, image_hash, layer=None, colors=None):
+        """Closest stored hash within ``max_distance`` holding ``layer`` and close to ``colors``, if given."""
+        if image_hash in self._entries and self._matches(image_hash, layer, colors):
+            return image_hash
+        if not self._entries or self.max_distance <= 0:
+            return None
+        if self._hashes is None:
+            # Snapshot of the keys; LRU reordering does not invalidate it
+            self._keys = list(self._entries)
+            self._hashes = np.array(self._keys, dtype=np.uint64)
+        keys = self._keys
+        distances = hamming_distances(self._hashes, image_hash)
+        for i in np.argsort(distances, kind="stable"):
+            if distances[i] > self.max_distance:
+                break
+            if self._matches(keys[i], layer, colors):
+                return keys[i]
+        return None
+
+    def _count(self, layer, outcome):
+        self.counters.setdefault(layer, {"hits": 0, "misses": 0})[outcome] += 1
+
+    def get(self, image_hash, layer, colors=None):
+        """The stored ``layer`` for this image or a near-identical one, else None."""
+        with self._lock:
+            key = self._nearest(image_hash, layer, colors)
+            if key is None:
+                self._count(layer, "misses")
+                return None
+            self._entries.move_to_end(key)
+            self._count(layer, "hits")
+            return self._entries[key][layer]
+
+    def put(self, image_hash, layer, value, colors=None):
+        with self._lock:
+            # A near-duplicate already cached keeps all its layers under one hash
+            key = self._nearest(image_hash, colors=colors)
+            if key is None:
+                key = image_hash
+                # Only a different image with the same hash can be stored here; replace it
+                self._entries.pop(key, None)
+                self._colors.pop(key, None)
+                if colors is not None:
+                    self._colors[key] = colors
+                self._hashes = None
+            self._entries.setdefault(key, {})[layer] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._colors.pop(self._entries.popitem(last=False)[0], None)
+                self.evictions += 1
+                self._hashes = None
+            self._schedule_flush()
+
+    def stats(self):
+        with self._lock:
+            layers = {}
+            for layer, counts in self.counters.items():
+                lookups = counts["hits"] + counts["misses"]
+                layers[layer] = {**counts, "hitRate": counts["hits"] / lookups if lookups else 0.0}
+            return {"entries": len(self._entries), "evictions": self.evictions, "layers": layers}
@@ -0,0 +1,39 @@
+import io
+import os
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Longest edge sent to Vision; its labels and colors don't improve past ~1000px
+MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+
+class ImageIngestError(ValueError):
+    """Raised when uploaded bytes are not a decodable image."""
+
+
+def ingest_image(data, max_edge=MAX_EDGE, quality=JPEG_QUALITY):
+    """Decode an uploaded image in memory and return compact JPEG bytes.
+
+    JPEGs are decoded in draft mode, which lets libjpeg scale by 1/2, 1/4 or
+    1/8 while decoding, so a full-resolution phone photo is never expanded in
+    memory. The result is downscaled to ``max_edge`` and re-encoded; if that
+    is not smaller than the upload, the original bytes are returned.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format == "JPEG":
+            image.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_edge, max_edge), Image.Resampling.BILINEAR, reducing_gap=2.0)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=quality, optimize=True)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ImageIngestError(f"Could not decode image: {e}") from e
+
+    content = out.getvalue()
+    if len(content) >= len(data):
+        return data
+    print(f"Downscaled image to {image.size[0]}x{image.size[1]}: {len(data)} -> {len(content)} bytes")
+    return content
@@ -3,7 +3,8 @@ from langchain_groq import ChatGroq
 
 system = """You are a SQL query generator for an IKEA furniture database. 
 The database has the following columns:
-- item_id: unique identifier
+- row_id: unique row identifier
+- item_id: product identifier
 - name: product name
 - category: furniture category (e.g., 'Bar furniture', 'Sofas', 'Tables')
 - price: product price
@@ -23,7 +24,7 @@ Generate SQL queries that:
 3. Include relevant product details
 4. Handle both specific and vague queries
 5. Use LIKE for text searches to handle partial matches
-6. Always include the description field in the results
+6. Always select all columns (SELECT *) so the row_id field is included in the results
 
 Example queries:
 - For a budget sofa: "SELECT * FROM furniture WHERE category LIKE '%Sofa%' AND price <= 500"
@@ -36,7 +37,9 @@ human = "{input}"
 
 prompt = ChatPromptTemplate.from_messages([("system", system), ("human", human)])
 
-def generate_sql_from_input(user_input, llm):
+def generate_sql_from_input(user_input, llm, gateway=None):
     chain = prompt | llm
+    if gateway is not None:
+        return gateway.invoke(chain, {"input": user_input}, purpose="sql")
     response = chain.invoke({"input": user_input})
     return response 
\ No newline at end of file
@@ -0,0 +1,180 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import metrics
+
+
+class LLMUnavailableError(RuntimeError):
+    """An LLM call was refused or abandoned; endpoints answer with ``status`` and Retry-After."""
+
+    status = 503
+    retry_after = 1
+
+
+class LLMOverloadedError(LLMUnavailableError):
+    """Too many calls already waiting for a slot; shed without queueing."""
+
+
+class LLMTimeoutError(LLMUnavailableError):
+    """The call's deadline passed while it was queued or running."""
+
+    status = 504
+
+
+def _canonical(value):
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class _Flight:
+    def __init__(self):
+        self.future = None
+        self.waiters = 1
+
+
+class LLMGateway:
+    """The one way out to the chat model clients.
+
+    Calls run on a pool of ``max_concurrency`` threads, so no more than that
+    many are ever open at the provider. Up to ``max_queue`` more wait for a
+    thread; beyond that a call fails at once with ``LLMOverloadedError``
+    rather than tying up a request thread. Identical concurrent calls (same
+    purpose and input) share one provider call. Every call has a deadline
+    covering its wait and the call itself; a caller past it gets
+    ``LLMTimeoutError`` while a call already running finishes in the
+    background. Use one runnable per ``purpose``: it is part of the
+    coalescing key in place of the runnable.
+    """
+
+    def __init__(self, max_concurrency=8, max_queue=32, timeout=30.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.waiting = 0
+        self.running = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+
+    def _admit(self, purpose):
+        # Caller holds self._lock; calls not yet picked up by an idle thread count as waiting
+        if self.running + self.waiting >= self.max_concurrency + self.max_queue:
+            metrics.registry.inc("decochat_llm_calls_total", purpose=purpose, result="shed")
+            raise LLMOverloadedError(f"LLM busy: {self.running} calls running and {self.waiting} waiting")
+        self.waiting += 1
+
+    def _started(self):
+        with self._lock:
+            self.waiting -= 1
+            self.running += 1
+
+    def _finished(self):
+        with self._lock:
+            self.running -= 1
+
+    def invoke(self, runnable, input, purpose, timeout=None):
+        """``runnable.invoke(input)`` through the gateway."""
+        timeout = timeout or self.timeout
+        deadline = time.monotonic() + timeout
+        key = (purpose, _canonical(input))
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                metrics.registry.inc("decochat_llm_calls_total", purpose=purpose, result="coalesced")
+            else:
+                self._admit(purpose)
+                flight = self._flights[key] = _Flight()
+                flight.future = self._pool.submit(self._run, key, flight, runnable, input, purpose)
+
+        try:
+            return flight.future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            with self._lock:
+                flight.waiters -= 1
+                # Nobody else wants it and it never started: take it off the queue
+                if flight.waiters == 0 and flight.future.cancel():
+                    self.waiting -= 1
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+            metrics.registry.inc("decochat_llm_calls_total", purpose=purpose, result="timeout")
+            raise LLMTimeoutError(f"LLM call for {purpose} exceeded {timeout}s") from None
+
+    def _run(self, key, flight, runnable, input, purpose):
+        self._started()
+        try:
+            response = runnable.invoke(input)
+        except Exception:
+            metrics.registry.inc("decochat_llm_calls_total", purpose=purpose, result="error")
+            raise
+        finally:
+            self._finished()
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+        metrics.registry.inc("decochat_llm_calls_total", purpose=purpose, result="ok")
+        metrics.record_llm_usage(purpose, response)
+        return response
+
+    def stream(self, runnable, input, purpose, timeout=None):
+        """Chunks of ``runnable.stream(input)`` through the gateway.
+
+        Streams are not coalesced. The stream holds its slot until it ends or
+        the consumer stops iterating; ``timeout`` bounds the wait for the
+        first chunk and each gap between chunks.
+        """
+        timeout = timeout or self.timeout
+        chunks = queue.Queue()
+        done = object()
+        stopped = threading.Event()
+
+        def produce():
+            self._started()
+            try:
+                for chunk in runnable.stream(input):
+                    if stopped.is_set():
+                        return
+                    metrics.record_llm_usage(purpose, chunk)
+                    chunks.put(chunk)
+                metrics.registry.inc("decochat_llm_calls_total", purpose=purpose, result="ok")
+                chunks.put(done)
+            except Exception as e:
+                metrics.registry.inc("decochat_llm_calls_total", purpose=purpose, result="error")
+                chunks.put(e)
+            finally:
+                self._finished()
+
+        with self._lock:
+            self._admit(purpose)
+            future = self._pool.submit(produce)
+
+        try:
+            while True:
+                try:
+                    chunk = chunks.get(timeout=timeout)
+                except queue.Empty:
+                    metrics.registry.inc("decochat_llm_calls_total", purpose=purpose, result="timeout")
+                    raise LLMTimeoutError(f"LLM stream for {purpose} stalled for {timeout}s") from None
+                if chunk is done:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            stopped.set()
+            with self._lock:
+                if future.cancel():
+                    self.waiting -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "maxConcurrency": self.max_concurrency,
+                "maxQueue": self.max_queue,
+                "running": self.running,
+                "waiting": self.waiting,
+                "coalescing": len(self._flights),
+            }
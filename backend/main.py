@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
 import pandas as pd
@@ -6,17 +6,40 @@ from dotenv import load_dotenv
 import textwrap
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_groq import ChatGroq
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-import sqlite3
-from inputSql import generate_sql_from_input
+from inputSql import generate_sql_from_input, system as sql_system
+from filter_parser import FilterParser
+from category_index import CategoryIndex
+from fit_index import FitIndex, parse_region
+from catalog_responses import CatalogResponses, conditional_response, parse_item_query
+from catalog_db import build_catalog_db, catalog_built_at, catalog_version, load_catalog_df
+from response_cache import SemanticResponseCache
+from session_store import create_session_store
+from context_builder import ContextBuilder, log_token_savings
+import db
+import metrics
+from embedding_registry import DEFAULT_EMBEDDING_BACKEND, DEFAULT_EMBEDDING_MODEL, get_embeddings, model_spec
+from embedding_cache import CachedEmbeddings
+from llm_gateway import LLMGateway, LLMUnavailableError
+from generate_embeddings import load_catalog_index
+from retrieval import HybridRetriever, LexicalIndex
 import numpy as np
-from google.cloud import vision
-from openai import OpenAI
+from image_ingest import ImageIngestError, ingest_image
+from image_cache import PerceptualImageCache, fingerprint
+from vision_pipeline import (
+    CARE_GUIDE_FEATURES,
+    MOODBOARD_FEATURES,
+    annotate,
+    care_guide_prompt,
+    get_vision_client,
+    moodboard_prompt,
+)
 import base64
 import io
 from PIL import Image
 import json
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
@@ -24,24 +47,36 @@ load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
+# Stage timings, Server-Timing headers, /metrics and opt-in profiling
+metrics.instrument_app(app)
+
+# One encoder per process; the catalog index must have been built by the same model
+embedding_model = DEFAULT_EMBEDDING_MODEL
+# Repeated queries and follow-up prefixes skip the encoder; concurrent misses share a batch
+embeddings = CachedEmbeddings(
+    get_embeddings(embedding_model),
+    f"{embedding_model}:{DEFAULT_EMBEDDING_BACKEND}",
+    uncased=model_spec(embedding_model)["uncased"],
+    max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+)
 
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
-vectorstore = FAISS.load_local("faiss_furniture_index", embeddings, allow_dangerous_deserialization=True)
+# Seconds an LLM call may take, including its wait for a gateway slot
+llm_timeout = float(os.getenv("LLM_TIMEOUT", "30"))
 
 chat = ChatGroq(
     temperature=0,
     groq_api_key=os.getenv("GROQ_API_KEY"),
-    model_name="llama-3.2-90b-vision-preview"
+    model_name="llama-3.2-90b-vision-preview",
+    request_timeout=llm_timeout,
 )
 
 sqlChat = ChatGroq(
     temperature=0,
     groq_api_key=os.getenv("GROQ_API_KEY"),
     model_name="llama-3.2-90b-vision-preview",
+    request_timeout=llm_timeout,
 )
 
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
 system = (
     "You are a helpful IKEA furniture recommendation assistant. "
     "Your goal is to help users find the perfect furniture based on their needs and preferences. "
@@ -65,19 +100,70 @@ prompt = ChatPromptTemplate.from_messages([("system", system), ("human", human)]
 
 chain = prompt | chat
 
-# Load and preprocess IKEA dataset
-df = pd.read_csv('IKEA_SA_Furniture_Web_Scrapings_sss.csv')
-# Create a combined description field for better search
-df['description'] = df['name'] + ' - ' + df['short_description'].fillna('') + ' - ' + df['category']
-# Clean up price data
-df['price'] = pd.to_numeric(df['price'], errors='coerce')
-# Create SQLite database
-conn = sqlite3.connect('furniture.db')
-df.to_sql('furniture', conn, index=False, if_exists='replace')
-conn.close()
+# Every outbound LLM call: identical concurrent prompts coalesced, LLM_MAX_CONCURRENCY
+# in flight and LLM_MAX_QUEUE waiting before new calls get a 503
+llm_gateway = LLMGateway(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "32")),
+    timeout=llm_timeout,
+)
+
+# Build furniture.db only if the CSV changed, then load the catalog from it
+build_catalog_db()
+df = load_catalog_df()
+
+# Local parser for common filters, so most turns skip the SQL-generating LLM
+filter_parser = FilterParser(df['category'].unique(), df['designer'].dropna().unique())
+
+# Category -> rows map for moodboard picks, so they never hit SQLite
+category_index = CategoryIndex(df)
+
+# Room planner responses, serialized and compressed at startup (once in the gunicorn master)
+catalog_responses = CatalogResponses(df, built_at=catalog_built_at(db.get_connection()))
+
+# Measured items sorted by footprint for "fits in my room" queries
+fit_index = FitIndex(df)
+
+# Embed the catalog once; chat turns only embed the query
+catalog_index = load_catalog_index(df, embedding_model)
+
+# BM25 next to the dense index so exact product names and sizes are found too
+retriever = HybridRetriever(
+    catalog_index,
+    LexicalIndex(df),
+    dense_weight=float(os.getenv("RETRIEVAL_DENSE_WEIGHT", "1.0")),
+    lexical_weight=float(os.getenv("RETRIEVAL_LEXICAL_WEIGHT", "1.0")),
+)
+
+# First-turn answers are cached until the catalog, prompts or encoder change
+response_cache = SemanticResponseCache(
+    max_entries=int(os.getenv("CHAT_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("CHAT_CACHE_TTL", "3600")),
+    threshold=float(os.getenv("CHAT_CACHE_THRESHOLD", "0.95")),
+)
+prompt_version = hashlib.sha256((system + human + sql_system).encode()).hexdigest()[:12]
+response_cache_version = f"{catalog_version(db.get_connection())}:{prompt_version}:{embedding_model}:{DEFAULT_EMBEDDING_BACKEND}:hybrid"
+
+# Search while the filter (possibly an LLM call) runs, then intersect. An unfiltered
+# scan grows with the catalog; past CHAT_SPECULATIVE_MAX_ROWS (~0.1s of scoring per
+# core at 50k rows) it costs more than the LLM call it hides, so wait for the filter
+speculative_retrieval = (
+    os.getenv("CHAT_SPECULATIVE_RETRIEVAL", "1") == "1"
+    and len(catalog_index) <= int(os.getenv("CHAT_SPECULATIVE_MAX_ROWS", "50000"))
+)
+speculative_candidates = int(os.getenv("CHAT_SPECULATIVE_CANDIDATES", "200"))
+retrieval_pool = ThreadPoolExecutor(max_workers=int(os.getenv("CHAT_RETRIEVAL_WORKERS", "8")))
+
+# Batch recommendations: queries in flight per batch, and queries per request. Each query
+# holds at most one gateway slot at a time, so the default leaves half of them to chat
+batch_concurrency = int(os.getenv("CHAT_BATCH_CONCURRENCY", str(max(1, llm_gateway.max_concurrency // 2))))
+batch_max_queries = int(os.getenv("CHAT_BATCH_MAX_QUERIES", "500"))
+
+# Per-consumer token budgets for follow-up context
+context_builder = ContextBuilder.from_env()
 
-# Store conversation histories for different chats
-conversation_histories = {}
+# Store conversation histories for different chats (SESSION_BACKEND=memory|sqlite)
+session_store = create_session_store()
 
 def sanitize_metadata(metadata):
     """Recursively sanitize metadata by replacing invalid JSON values."""
@@ -89,100 +175,483 @@ def sanitize_metadata(metadata):
         return None 
     return metadata
 
+def matching_row_ids(filtered_df):
+    """Catalog row ids selected by a generated SQL query, or None to search everything."""
+    if 'row_id' in filtered_df.columns:
+        row_ids = filtered_df['row_id']
+    elif 'item_id' in filtered_df.columns:
+        row_ids = df.index[df['item_id'].isin(filtered_df['item_id'])]
+    else:
+        raise ValueError("SQL result has no row_id or item_id column")
+    row_ids = set(int(row_id) for row_id in row_ids.dropna())
+    if not row_ids:
+        print("SQL query matched no rows, using full dataset")
+        metrics.registry.inc("decochat_filter_fallback_total", reason="no_rows")
+        return None
+    return row_ids
+
+def query_generated_sql(sql):
+    """Run an LLM-generated query, fetching only ``row_id`` when it selects one.
+
+    The prompt asks for ``SELECT *``, but only the ids are used; every column
+    of a broad match is megabytes per turn on a large catalog. Queries
+    without a ``row_id`` column (e.g. ``SELECT item_id``) run as written and
+    ``matching_row_ids`` maps them to rows.
+    """
+    return db.query_ids_df(sql)
+
+def parse_filters(user_input, history):
+    with metrics.stage('filter_rules'):
+        return filter_parser.parse_conversation(user_input, [entry['query'] for entry in history])
+
+def filter_row_ids(user_input, history, filters=None):
+    """Row ids to search plus the path that chose them: 'rules' or 'llm'.
+
+    The rule-based parser handles common budget, size, category and designer
+    filters locally; only queries it cannot parse confidently go to the LLM.
+    """
+    if filters is None:
+        filters = parse_filters(user_input, history)
+    if filters.confident:
+        sql, params = filters.to_sql()
+        print("Rule-based filter: ", sql, params)
+        try:
+            with metrics.stage('sql_query'):
+                filtered_df = db.query_df(sql, params)
+        except Exception as e:
+            print(f"Rule-based filter failed, using full dataset: {e}")
+            metrics.registry.inc("decochat_filter_fallback_total", reason="rules_error")
+            return None, 'rules'
+        if not filtered_df.empty:
+            return matching_row_ids(filtered_df), 'rules'
+        # Probably a misread message rather than an empty catalog slice
+        print("Rule-based filter matched no rows, asking the LLM")
+        metrics.registry.inc("decochat_filter_fallback_total", reason="rules_no_rows")
+    else:
+        print(f"Rule-based filter not confident ({filters.reason}), asking the LLM")
+
+    sql_input = user_input
+    if history:
+        sql_input = context_builder.sql_context(user_input, history, filters.describe())
+        log_token_savings(user_input, history, sql=sql_input)
+    with metrics.stage('sql_llm'):
+        sql_query = generate_sql_from_input(sql_input, sqlChat, llm_gateway)
+
+    print("Query is: ", sql_query)
+
+    try:
+        with metrics.stage('sql_query'):
+            filtered_df = query_generated_sql(sql_query.content)
+        return matching_row_ids(filtered_df), 'llm'
+    except Exception as e:
+        print(f"SQL query failed, using full dataset: {e}")
+        metrics.registry.inc("decochat_filter_fallback_total", reason="sql_error")
+        return None, 'llm'
+
+def llm_unavailable(error):
+    """503 (504 past the deadline) with Retry-After, so clients back off instead of piling on."""
+    response = jsonify({'error': str(error)})
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 @app.route('/api/chat', methods=['DELETE'])
 def reset_chat():
     chat_id = request.args.get('chatId')
-    if chat_id in conversation_histories:
-        del conversation_histories[chat_id]
+    if chat_id is not None:
+        session_store.reset(chat_id)
     return jsonify({'status': 'success'})
 
+@app.route('/api/chat/cache-stats', methods=['GET'])
+def chat_cache_stats():
+    return jsonify(response_cache.stats())
+
+@app.route('/api/chat/llm-stats', methods=['GET'])
+def llm_gateway_stats():
+    return jsonify(llm_gateway.stats())
+
+@app.route('/api/chat/embedding-stats', methods=['GET'])
+def embedding_cache_stats():
+    return jsonify(embeddings.stats())
+
+def prepare_chat_turn(user_input, chat_id):
+    """Run everything a chat turn needs before the answer LLM.
+
+    Returns the turn state used by ``answer_inputs`` and ``finish_chat_turn``;
+    ``turn['cached']`` holds a cached answer when one can be reused.
+    """
+    history = session_store.get_history(chat_id)
+
+    is_follow_up = "follow-up" in user_input.lower() or (len(history) > 0 and not user_input.lower().startswith(('new', 'reset', 'start over')))
+    recent_history = history[-6:] if is_follow_up else []
+    retrieval_query = user_input
+    answer_query = user_input
+
+    if is_follow_up:
+        # Each consumer gets its own trimmed context instead of the full transcript
+        retrieval_query = context_builder.retrieval_context(user_input, recent_history)
+        answer_query = context_builder.answer_context(user_input, recent_history)
+        log_token_savings(user_input, recent_history, retrieval=retrieval_query, answer=answer_query)
+
+    # The LLM filter needs no embedding, so it runs while the query is embedded;
+    # on a response cache hit its result is dropped (a cancelled call if still queued)
+    filters = parse_filters(user_input, recent_history)
+    filtering = None
+    if not filters.confident:
+        filtering = metrics.submit(retrieval_pool, filter_row_ids, user_input, recent_history, filters)
+
+    with metrics.stage('embed'):
+        query_vector = embeddings.embed_query(retrieval_query)
+
+    turn = {
+        'user_input': user_input,
+        'chat_id': chat_id,
+        'is_follow_up': is_follow_up,
+        'answer_query': answer_query,
+        'query_vector': query_vector,
+        'cached': None,
+    }
+
+    if not is_follow_up:
+        with metrics.stage('response_cache'):
+            turn['cached'] = response_cache.get(user_input, query_vector, response_cache_version)
+        if turn['cached'] is not None:
+            print(f"Response cache hit for: {user_input}")
+            if filtering is not None and not filtering.cancel():
+                metrics.registry.inc("decochat_filter_discarded_total")
+            turn['metadata'] = turn['cached']['metadata']
+            turn['filter_source'] = 'cache'
+            return turn
+
+    if filtering is None:
+        row_ids, turn['filter_source'] = filter_row_ids(user_input, recent_history, filters)
+        with metrics.stage('search'):
+            search_results = retriever.search(retrieval_query, query_vector, k=5, row_ids=row_ids)
+    elif speculative_retrieval:
+        # Only the LLM filter is slow enough to hide the search behind
+        with metrics.stage('search'):
+            candidates = retriever.search(retrieval_query, query_vector, k=speculative_candidates)
+        row_ids, turn['filter_source'] = filtering.result()
+        # No filter or a failed one keeps the candidates; widen only if too few pass
+        search_results = retriever.restrict(candidates, row_ids, k=5)
+        if search_results is None:
+            print(f"Fewer than 5 of {len(candidates)} candidates pass the filter, searching filtered rows")
+            with metrics.stage('search'):
+                search_results = retriever.search(retrieval_query, query_vector, k=5, row_ids=row_ids)
+    else:
+        row_ids, turn['filter_source'] = filtering.result()
+        with metrics.stage('search'):
+            search_results = retriever.search(retrieval_query, query_vector, k=5, row_ids=row_ids)
+    turn['metadata'], turn['formatted_results'] = format_matches(search_results)
+    return turn
+
+def format_matches(search_results):
+    """Response metadata and the numbered descriptions given to the answer LLM."""
+    matches = df.loc[[row_id for row_id, _ in search_results]]
+
+    metadata = [
+        sanitize_metadata(record)
+        for record in matches.drop(columns=["description"]).reset_index().to_dict(orient="records")
+    ]
+
+    formatted_results = "\n".join(
+        f"{i+1}. {description}"
+        for i, description in enumerate(matches["description"])
+    )
+    return metadata, formatted_results
+
+def answer_inputs(turn):
+    return {
+        "query": turn['answer_query'],
+        "results": turn['formatted_results']
+    }
+
+def finish_chat_turn(turn, response_text):
+    """Record a completed answer in the conversation history and response cache."""
+    session_store.append_turn(turn['chat_id'], turn['user_input'], response_text)
+
+    if not turn['is_follow_up'] and turn['cached'] is None:
+        response_cache.put(turn['user_input'], turn['query_vector'], {
+            'response': response_text,
+            'metadata': turn['metadata']
+        }, response_cache_version)
+
+def json_object_body():
+    """The request's JSON object ({} when there is no body); ValueError for any other JSON value."""
+    data = request.get_json(silent=True)
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object.')
+    return data
+
+def parse_chat_request():
+    """``(message, chat_id)`` from the request; raises ValueError on a malformed body."""
+    data = json_object_body()
+    message, chat_id = data.get('message', ''), data.get('chatId', 'default')
+    if not isinstance(message, str) or not isinstance(chat_id, str):
+        raise ValueError('message and chatId must be strings.')
+    return message.strip(), chat_id
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/api/chat/session-stats', methods=['GET'])
+def chat_session_stats():
+    return jsonify(session_store.stats())
+
 @app.route('/api/chat', methods=['POST'])
 def chat_endpoint():
-    data = request.get_json()
-    user_input = data.get('message', '').strip()
-    chat_id = data.get('chatId', 'default')
+    if request.args.get('stream') == '1':
+        return chat_stream_endpoint()
+
+    try:
+        user_input, chat_id = parse_chat_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     if not user_input:
         return jsonify({'error': 'No message provided.'}), 400
 
     try:
-        # Initialize conversation history for new chat
-        if chat_id not in conversation_histories:
-            conversation_histories[chat_id] = []
+        turn = prepare_chat_turn(user_input, chat_id)
 
-        is_follow_up = "follow-up" in user_input.lower() or (len(conversation_histories[chat_id]) > 0 and not user_input.lower().startswith(('new', 'reset', 'start over')))
-        session_context = ""
-        enriched_user_input = user_input
+        if turn['cached'] is not None:
+            response_text = turn['cached']['response']
+        else:
+            with metrics.stage('answer_llm'):
+                response = llm_gateway.invoke(chain, answer_inputs(turn), 'answer')
+            response_text = response.content
 
-        if is_follow_up:
-            session_context = "\n".join(
-                f"User: {entry['query']}\nAssistant: {entry['response']}"
-                for entry in conversation_histories[chat_id][-6:]
-            )
-            enriched_user_input = f"{session_context}\nUser: {user_input}"
+        finish_chat_turn(turn, response_text)
 
-        sql_query = generate_sql_from_input(enriched_user_input, sqlChat)
+        print(f"\nAssistant: {response_text}")
 
-        print("Query is: ", sql_query)
-    
-        try:
-            conn = sqlite3.connect('furniture.db')
-            filtered_df = pd.read_sql_query(sql_query.content, conn)
-            conn.close()
-
-            texts = filtered_df["description"].tolist()
-            metadata = filtered_df.drop(columns=["description"]).to_dict(orient="records")
-            vectorstore = FAISS.from_texts(texts, embeddings, metadatas=metadata)
-        except Exception as e:
-            print(f"SQL query failed, using full dataset: {e}")
-            texts = df["description"].tolist()
-            metadata = df.drop(columns=["description"]).to_dict(orient="records")
-            vectorstore = FAISS.from_texts(texts, embeddings, metadatas=metadata)
-
-        enriched_query = enriched_user_input if is_follow_up else user_input
-        search_results = vectorstore.similarity_search(enriched_query, k=5)
+        response_data = {
+            'response': response_text,
+            'metadata': turn['metadata'],
+            'filterSource': turn['filter_source']
+        }
 
-        metadata_results = [sanitize_metadata(result.metadata) for result in search_results]
+        return jsonify(response_data)
+    except LLMUnavailableError as e:
+        return llm_unavailable(e)
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({'error': str(e)}), 500
 
-        formatted_results = "\n".join(
-            f"{i+1}. {result.page_content}"
-            for i, result in enumerate(search_results)
-        )
+def answer_batch_query(query, query_vector, candidates):
+    """One batch query as a stateless first turn; ``candidates`` are its unfiltered matches."""
+    with metrics.stage('response_cache'):
+        cached = response_cache.get(query, query_vector, response_cache_version)
+    if cached is not None:
+        return {'response': cached['response'], 'metadata': cached['metadata'], 'filterSource': 'cache'}
+
+    row_ids, filter_source = filter_row_ids(query, [])
+    search_results = retriever.restrict(candidates, row_ids, k=5)
+    if search_results is None:
+        with metrics.stage('search'):
+            search_results = retriever.search(query, query_vector, k=5, row_ids=row_ids)
+    metadata, formatted_results = format_matches(search_results)
+
+    with metrics.stage('answer_llm'):
+        response = llm_gateway.invoke(chain, {"query": query, "results": formatted_results}, 'batch_answer')
+    response_cache.put(query, query_vector, {'response': response.content, 'metadata': metadata}, response_cache_version)
+    return {'response': response.content, 'metadata': metadata, 'filterSource': filter_source}
+
+def recommend_batch(queries, concurrency=None):
+    """Answer independent recommendation queries, yielding each result as it completes.
+
+    Every query is treated as a new conversation: no session history is read
+    or written, but answers go through the response cache. All queries are
+    embedded in one encoder batch and ranked in one pass over the catalog
+    matrix; filters and answers then run with at most ``concurrency`` (capped
+    at CHAT_BATCH_CONCURRENCY) queries in flight. Identical queries are
+    answered once. Yields ``{'index', 'query', ...}`` dicts, where ``index``
+    is the query's position in ``queries`` and failures carry ``error``.
+    """
+    concurrency = max(1, min(concurrency or batch_concurrency, batch_concurrency))
+    groups = {}
+    for index, query in enumerate(queries):
+        groups.setdefault(embeddings.normalize(query), []).append(index)
+    texts = [queries[indices[0]] for indices in groups.values()]
+
+    with metrics.stage('embed'):
+        vectors = embeddings.embed_many(texts)
+    with metrics.stage('search'):
+        candidates = retriever.search_many(texts, np.stack(vectors), k=speculative_candidates)
+
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = {
+            metrics.submit(pool, answer_batch_query, text, vector, text_candidates): indices
+            for text, vector, text_candidates, indices in zip(texts, vectors, candidates, groups.values())
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Batch query failed: {e}")
+                result = {'error': str(e)}
+            for index in futures[future]:
+                yield {'index': index, 'query': queries[index], **result}
+    finally:
+        # A client that disconnects mid-stream should not keep queued LLM calls running
+        pool.shutdown(wait=False, cancel_futures=True)
 
-        response = chain.invoke({
-            "query": enriched_user_input,
-            "results": formatted_results
-        })
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch_endpoint():
+    """Recommendations for many independent queries, as Server-Sent Events.
 
-        conversation_histories[chat_id].append({
-            "query": user_input,
-            "response": response.content
-        })
+    Body: {"queries": ["...", ...], "concurrency": n (optional)}. Sends a
+    ``result`` event per query as soon as it is answered, in completion
+    order, then ``done`` with the number of results and errors.
+    """
+    try:
+        data = json_object_body()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries:
+        return jsonify({'error': 'queries must be a non-empty list.'}), 400
+    if len(queries) > batch_max_queries:
+        return jsonify({'error': f'At most {batch_max_queries} queries per batch.'}), 400
+    if not all(isinstance(query, str) and query.strip() for query in queries):
+        return jsonify({'error': 'Every query must be a non-empty string.'}), 400
+    try:
+        concurrency = int(data['concurrency']) if data.get('concurrency') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency must be an integer.'}), 400
+    queries = [query.strip() for query in queries]
 
-        print(f"\nAssistant: {response.content}")
+    def events():
+        errors = 0
+        try:
+            for result in recommend_batch(queries, concurrency):
+                errors += 'error' in result
+                yield sse_event('result', result)
+        except Exception as e:
+            print(f"Error in batch: {e}")
+            yield sse_event('error', {'error': str(e)})
+            return
+        yield sse_event('done', {'count': len(queries), 'errors': errors})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream_endpoint():
+    """Server-Sent Events variant of /api/chat.
+
+    Sends a ``metadata`` event as soon as retrieval finishes, then ``token``
+    events as the answer streams in, then ``done`` with the full answer. The
+    turn is only added to the conversation history once the stream completes.
+    """
+    try:
+        user_input, chat_id = parse_chat_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        response_data = {
-            'response': response.content,
-            'metadata': metadata_results
-        }
+    if not user_input:
+        return jsonify({'error': 'No message provided.'}), 400
 
-        return jsonify(response_data)
+    try:
+        turn = prepare_chat_turn(user_input, chat_id)
+    except LLMUnavailableError as e:
+        return llm_unavailable(e)
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({'error': str(e)}), 500
 
-# Initialize Google Cloud Vision client
-vision_client = vision.ImageAnnotatorClient()
+    def events():
+        yield sse_event('metadata', {
+            'metadata': turn['metadata'],
+            'filterSource': turn['filter_source']
+        })
+
+        if turn['cached'] is not None:
+            response_text = turn['cached']['response']
+            yield sse_event('token', {'text': response_text})
+        else:
+            parts = []
+            try:
+                # Recorded in the stage histogram; Server-Timing was sent with the headers
+                with metrics.stage('answer_llm'):
+                    for chunk in llm_gateway.stream(chain, answer_inputs(turn), 'answer'):
+                        if chunk.content:
+                            parts.append(chunk.content)
+                            yield sse_event('token', {'text': chunk.content})
+            except Exception as e:
+                print(f"Error while streaming: {e}")
+                yield sse_event('error', {'error': str(e)})
+                return
+            response_text = "".join(parts)
+
+        finish_chat_turn(turn, response_text)
+        print(f"\nAssistant: {response_text}")
+        yield sse_event('done', {'response': response_text})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 # Initialize Groq client for furniture analysis
 furnitureChat = ChatGroq(
     temperature=0.7,
     groq_api_key=os.getenv("GROQ_API_KEY"),
-    model_name="llama-3.2-90b-vision-preview"
+    model_name="llama-3.2-90b-vision-preview",
+    request_timeout=llm_timeout,
+)
+
+# Vision annotations and LLM results for images seen before, matched by perceptual hash
+image_cache = PerceptualImageCache(
+    path=os.getenv("IMAGE_CACHE_PATH", "image_cache.json"),
+    max_entries=int(os.getenv("IMAGE_CACHE_SIZE", "2048")),
 )
+# LLM layers are keyed by prompt so editing a prompt only re-runs the LLM
+care_guide_layer = "care_guide:" + hashlib.sha256(care_guide_prompt("").encode()).hexdigest()[:8]
+moodboard_layer = "moodboard:" + hashlib.sha256(moodboard_prompt([], []).encode()).hexdigest()[:8]
+
+@app.route('/api/image-cache-stats', methods=['GET'])
+def image_cache_stats():
+    return jsonify(image_cache.stats())
+
+def cache_metric_samples():
+    """Cache, session and LLM gateway figures, read from each one's stats at scrape time."""
+    lookups = "counter", "Cache lookups by cache and result."
+    entries = "gauge", "Entries currently held by each cache."
+    caches = {"response": response_cache.stats(), "embedding": embeddings.stats()}
+    for cache, stats in caches.items():
+        for result, key in (("hit", "hits"), ("miss", "misses")):
+            yield ("decochat_cache_lookups_total", *lookups, {"cache": cache, "result": result}, stats[key])
+        yield ("decochat_cache_entries", *entries, {"cache": cache}, stats["entries"])
+    image_stats = image_cache.stats()
+    for layer, counts in image_stats["layers"].items():
+        for result, key in (("hit", "hits"), ("miss", "misses")):
+            yield ("decochat_cache_lookups_total", *lookups, {"cache": f"image:{layer}", "result": result}, counts[key])
+    yield ("decochat_cache_entries", *entries, {"cache": "image"}, image_stats["entries"])
+
+    gateway = llm_gateway.stats()
+    yield ("decochat_llm_running", "gauge", "LLM calls currently open at the provider.", {}, gateway["running"])
+    yield ("decochat_llm_waiting", "gauge", "LLM calls waiting for a gateway slot.", {}, gateway["waiting"])
+
+    sessions = session_store.stats()
+    yield ("decochat_sessions", "gauge", "Conversation sessions currently stored.", {}, sessions["sessions"])
+    yield ("decochat_session_bytes", "gauge", "Bytes of conversation history stored.", {}, sessions["bytes"])
+    for reason in ("expired", "evicted"):
+        yield ("decochat_sessions_dropped_total", "counter", "Sessions dropped by idle expiry or size eviction.",
+               {"reason": reason}, sessions[reason])
+
+metrics.registry.add_collector(cache_metric_samples)
 
 @app.route('/api/analyze-furniture', methods=['POST'])
 def analyze_furniture():
+    timer = metrics.request_timer()
     try:
         data = request.get_json()
         if not data or 'image' not in data:
@@ -191,25 +660,30 @@ def analyze_furniture():
         print("Received image data, length:", len(data['image']))
         
         try:
-            image_data = base64.b64decode(data['image'])
+            with timer.stage('ingest'):
+                image_data = ingest_image(base64.b64decode(data['image']))
+            with timer.stage('hash'):
+                image_hash, image_colors = fingerprint(image_data)
             print("Successfully decoded base64 image")
         except Exception as e:
-            print(f"Error decoding base64: {str(e)}")
+            print(f"Error decoding image: {str(e)}")
             return jsonify({'error': 'Invalid image data'}), 400
         
+        care_guide = image_cache.get(image_hash, care_guide_layer, image_colors)
+        if care_guide is not None:
+            print(f"Care guide cache hit for image {image_hash:016x}")
+            return jsonify(care_guide)
+
         try:
-            # Create Vision API image
-            image = vision.Image(content=image_data)
-            print("Created Vision API image object")
-            
-            # Perform label detection
-            response = vision_client.label_detection(image=image)
-            labels = [label.description for label in response.label_annotations]
+            # Labels and objects in one Vision request, unless this image was annotated before
+            annotations = image_cache.get(image_hash, 'vision:care_guide', image_colors)
+            if annotations is None:
+                with timer.stage('vision'):
+                    annotations = annotate(get_vision_client(), image_data, CARE_GUIDE_FEATURES)
+                image_cache.put(image_hash, 'vision:care_guide', annotations, image_colors)
+            labels = annotations['labels']
+            objects = annotations['objects']
             print("Detected labels:", labels)
-            
-            # Perform object detection
-            objects_response = vision_client.object_localization(image=image)
-            objects = [obj.name for obj in objects_response.localized_object_annotations]
             print("Detected objects:", objects)
             
             # Combine labels and objects for better context
@@ -222,24 +696,10 @@ def analyze_furniture():
         
         try:
             # Generate care guide using Groq
-            prompt = f"""Based on the following furniture context: {furniture_context}
-
-Please provide a concise care guide with the following sections (keep each section to 1-2 sentences):
-
-1. Materials: Briefly identify the main materials
-2. Cleaning Tips: Provide 1-2 key cleaning instructions
-3. Maintenance Schedule: List 2-3 main maintenance tasks
-
-IMPORTANT: Your response MUST be a valid JSON object with EXACTLY these keys:
-{{
-    "materials": "brief materials description",
-    "cleaningTips": "1-2 key cleaning tips",
-    "maintenanceSchedule": "2-3 main maintenance tasks"
-}}
-
-Keep responses short and to the point. Do not include any additional text or formatting outside the JSON object."""
+            prompt = care_guide_prompt(furniture_context)
             print("Sending request to Groq...")
-            response = furnitureChat.invoke(prompt)
+            with timer.stage('llm'):
+                response = llm_gateway.invoke(furnitureChat, prompt, 'care_guide')
             print("Received response from Groq")
             print("Raw response:", response.content)
             
@@ -255,12 +715,14 @@ Keep responses short and to the point. Do not include any additional text or for
                 
                 care_guide = json.loads(content)
                 print("Successfully parsed care guide")
+                print("Care guide timings:", timer.summary())
                 
                 # Validate the required keys are present
                 required_keys = ['materials', 'cleaningTips', 'maintenanceSchedule']
                 if not all(key in care_guide for key in required_keys):
                     raise ValueError("Missing required keys in response")
                 
+                image_cache.put(image_hash, care_guide_layer, care_guide, image_colors)
                 return jsonify(care_guide)
             except json.JSONDecodeError as e:
                 print(f"JSON parsing error: {str(e)}")
@@ -270,6 +732,8 @@ Keep responses short and to the point. Do not include any additional text or for
                 print(f"Validation error: {str(e)}")
                 return jsonify({'error': str(e)}), 500
             
+        except LLMUnavailableError as e:
+            return llm_unavailable(e)
         except Exception as e:
             print(f"Error with Groq: {str(e)}")
             return jsonify({'error': f'Groq error: {str(e)}'}), 500
@@ -280,6 +744,7 @@ Keep responses short and to the point. Do not include any additional text or for
 
 @app.route('/api/analyze-moodboard', methods=['POST'])
 def analyze_moodboard():
+    timer = metrics.request_timer()
     try:
         if 'image' not in request.files:
             return jsonify({'error': 'No image provided'}), 400
@@ -288,132 +753,61 @@ def analyze_moodboard():
         if not image_file.filename:
             return jsonify({'error': 'No image selected'}), 400
 
-        # Ensure uploads directory exists
-        uploads_dir = 'uploads'
-        if not os.path.exists(uploads_dir):
-            os.makedirs(uploads_dir)
-
-        # Save the image temporarily
-        temp_path = os.path.join(uploads_dir, 'temp_moodboard.jpg')
-        try:
-            image_file.save(temp_path)
-        except Exception as e:
-            return jsonify({'error': f'Failed to save image: {str(e)}'}), 500
-
-        # Initialize Google Vision API client
-        try:
-            client = vision.ImageAnnotatorClient()
-        except Exception as e:
-            return jsonify({'error': f'Failed to initialize Vision API client: {str(e)}'}), 500
-
-        # Read the image file
+        # Decode and downscale the upload in memory
         try:
-            with open(temp_path, 'rb') as image_file:
-                content = image_file.read()
+            with timer.stage('ingest'):
+                content = ingest_image(image_file.read())
+            with timer.stage('hash'):
+                image_hash, image_colors = fingerprint(content)
+        except ImageIngestError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': f'Failed to read image file: {str(e)}'}), 500
 
-        image = vision.Image(content=content)
-        
-        # Perform image analysis
-        try:
-            response = client.label_detection(image=image)
-            labels = [label.description for label in response.label_annotations]
-            
-            # Get image properties
-            response = client.image_properties(image=image)
-            colors = []
-            for color in response.image_properties_annotation.dominant_colors.colors:
-                colors.append({
-                    'red': color.color.red,
-                    'green': color.color.green,
-                    'blue': color.color.blue,
-                    'score': color.score
-                })
-        except Exception as e:
-            return jsonify({'error': f'Failed to analyze image: {str(e)}'}), 500
-
-        # Connect to IKEA database
-        try:
-            conn = sqlite3.connect('furniture.db')
-            cursor = conn.cursor()
-        except Exception as e:
-            return jsonify({'error': f'Failed to connect to database: {str(e)}'}), 500
-
-        # Generate room vibe description and furniture recommendations
-        try:
-            prompt = f"""
-            Based on the following image analysis:
-            - Labels: {', '.join(labels)}
-            - Dominant colors: {json.dumps(colors)}
-            
-            Please provide:
-            1. A brief description of the room's vibe and style
-            2. 3-5 furniture categories that would complement this space. 
-               IMPORTANT: Use ONLY these exact categories from our database:
-               - Bar furniture
-               - Beds
-               - Bookcases & shelving units
-               - Cabinets & cupboards
-               - Café furniture
-            
-            Format the response as a JSON object with the following structure:
-            {{
-                "vibe": "description of the room's vibe",
-                "categories": ["category1", "category2", "category3"]
-            }}
-            """
-            response = chat.invoke(prompt)
-            analysis = json.loads(response.content)
-            print("Generated categories:", analysis['categories'])  # Debug log
-        except Exception as e:
-            return jsonify({'error': f'Failed to generate recommendations: {str(e)}'}), 500
+        # Vibe and categories are reused for a seen image; recommendations are still drawn fresh
+        analysis = image_cache.get(image_hash, moodboard_layer, image_colors)
+        if analysis is None:
+            # Perform image analysis: labels and colors in one Vision request
+            try:
+                annotations = image_cache.get(image_hash, 'vision:moodboard', image_colors)
+                if annotations is None:
+                    with timer.stage('vision'):
+                        annotations = annotate(get_vision_client(), content, MOODBOARD_FEATURES)
+                    image_cache.put(image_hash, 'vision:moodboard', annotations, image_colors)
+                labels = annotations['labels']
+                colors = annotations['colors']
+            except Exception as e:
+                return jsonify({'error': f'Failed to analyze image: {str(e)}'}), 500
+
+            # Generate room vibe description and furniture recommendations
+            try:
+                with timer.stage('llm'):
+                    response = llm_gateway.invoke(chat, moodboard_prompt(labels, colors), 'moodboard')
+                analysis = json.loads(response.content)
+                print("Generated categories:", analysis['categories'])  # Debug log
+            except LLMUnavailableError as e:
+                return llm_unavailable(e)
+            except Exception as e:
+                return jsonify({'error': f'Failed to generate recommendations: {str(e)}'}), 500
+            image_cache.put(image_hash, moodboard_layer, analysis, image_colors)
+        else:
+            print(f"Moodboard cache hit for image {image_hash:016x}")
         
-        # Get recommendations from IKEA database
+        # Get recommendations from the in-memory category index
         recommendations = []
         seen_names = set()  # To avoid duplicate names
         try:
-            # First, let's check what categories exist in the database
-            cursor.execute("SELECT DISTINCT category FROM furniture")
-            existing_categories = [row[0] for row in cursor.fetchall()]
-            print("Existing categories in DB:", existing_categories)  # Debug log
-
             for category in analysis['categories']:
                 print(f"Searching for category: {category}")  # Debug log
-                # Try exact match first
-                cursor.execute("""
-                    SELECT name, short_description, price, link 
-                    FROM furniture 
-                    WHERE category = ?
-                    ORDER BY RANDOM() 
-                    LIMIT 1
-                """, (category,))
-                
-                result = cursor.fetchone()
-                if not result:
-                    # If no exact match, try partial match
-                    cursor.execute("""
-                        SELECT name, short_description, price, link 
-                        FROM furniture 
-                        WHERE category LIKE ?
-                        ORDER BY RANDOM() 
-                        LIMIT 1
-                    """, (f'%{category}%',))
-                    result = cursor.fetchone()
-
-                if result:
-                    name, description, price, link = result
-                    # Only add recommendation if the name hasn't been added yet
-                    if name in seen_names:
-                        print(f"Duplicate found for {name}, skipping.")
-                        continue
-                    seen_names.add(name)
+                item = category_index.sample(category, exclude_names=seen_names)
+                if item:
+                    seen_names.add(item['name'])
                     recommendations.append({
-                        'name': name,
-                        'description': f"{description} (Price: {price})",
-                        'link': link
+                        'name': item['name'],
+                        'description': f"{item['short_description']} (Price: {item['price']})",
+                        'link': item['link']
                     })
-                    print(f"Found match: {name} with link: {link}")  # Debug log
+                    print(f"Found match: {item['name']} with link: {item['link']}")  # Debug log
                 else:
                     print(f"No match found for category: {category}")  # Debug log
 
@@ -421,14 +815,7 @@ def analyze_moodboard():
         except Exception as e:
             return jsonify({'error': f'Failed to query database: {str(e)}'}), 500
 
-        conn.close()
-
-        # Clean up temporary file
-        try:
-            os.remove(temp_path)
-        except:
-            pass  # Ignore cleanup errors
-
+        print("Moodboard timings:", timer.summary())
         return jsonify({
             'vibe': analysis['vibe'],
             'recommendations': recommendations
@@ -439,56 +826,85 @@ def analyze_moodboard():
 
 @app.route('/api/furniture-categories', methods=['GET'])
 def get_furniture_categories():
-    try:
-        conn = sqlite3.connect('furniture.db')
-        cursor = conn.cursor()
-        
-        # Get unique categories
-        cursor.execute("SELECT DISTINCT category FROM furniture")
-        categories = [row[0] for row in cursor.fetchall()]
-        
-        return jsonify({'categories': categories})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        conn.close()
+    payload, last_modified = catalog_responses.categories()
+    return conditional_response(payload, last_modified, request)
 
 @app.route('/api/furniture-items/<category>', methods=['GET'])
 def get_furniture_items(category):
+    # Items with all measurements, one per name; ?offset=&limit= pages, ?fields=name,width trims
     try:
-        conn = sqlite3.connect('furniture.db')
-        cursor = conn.cursor()
-        
-        # Get furniture items for the selected category that have all measurements
-        cursor.execute("""
-            SELECT name, width, height, depth, short_description 
-            FROM furniture 
-            WHERE category = ? 
-            AND width IS NOT NULL 
-            AND height IS NOT NULL 
-            AND depth IS NOT NULL
-        """, (category,))
-        
-        items = []
-        seen_names = set()  # Track names we've already added
-        for row in cursor.fetchall():
-            name, width, height, depth, description = row
-            if name in seen_names:
-                continue
-            seen_names.add(name)
-            items.append({
-                'name': name,
-                'width': width,
-                'height': height,
-                'depth': depth,
-                'description': description
-            })
-        
-        return jsonify({'items': items})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        conn.close()
+        offset, limit, fields = parse_item_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    payload, last_modified = catalog_responses.items(category, offset, limit, fields)
+    return conditional_response(payload, last_modified, request)
+
+@app.route('/api/furniture-fit', methods=['POST'])
+def furniture_fit():
+    """Items that fit one or more free areas of the room, in either orientation.
+
+    Body: {"regions": [{"width", "depth", "height"?}, ...]} or a single
+    region's fields, plus optional "category", "maxPrice", "clearance",
+    "sort" ('price' or 'fit') and "limit". Dimensions are in cm.
+    """
+    try:
+        data = json_object_body()
+        regions = [parse_region(region) for region in data.get('regions') or [data]]
+        options = {
+            'category': data.get('category'),
+            'max_price': float(data['maxPrice']) if data.get('maxPrice') is not None else None,
+            'clearance': float(data.get('clearance') or 0),
+            'sort': data.get('sort', 'price'),
+            'limit': max(1, min(int(data.get('limit', 20)), 200)),
+        }
+        results = [
+            {'region': {'width': width, 'depth': depth, 'height': height},
+             **fit_index.query(width, depth, height, **options)}
+            for width, depth, height in regions
+        ]
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'results': results})
+
+# Flipped by warm_up(); load balancers hold traffic until a worker is ready
+readiness = {'ready': False, 'warmupMs': None}
+
+def warm_up():
+    """Run the encoder, both retrievers and the catalog payloads once before taking traffic.
+
+    The first encode pays for lazy weight and tokenizer setup, and the first
+    search pages in the vector index; doing that here keeps it out of the
+    first user's request. Called once per serving process.
+    """
+    start = time.perf_counter()
+    timer = metrics.StageTimer()
+    probe = "comfortable sofa for a small living room"
+    with timer.stage('warmup_embed'):
+        # Straight to the encoder so the probe does not sit in the query cache
+        query_vector = np.asarray(embeddings.embeddings.embed_query(probe), dtype=np.float32)
+    with timer.stage('warmup_search'):
+        retriever.search(probe, query_vector, k=5)
+    with timer.stage('warmup_catalog'):
+        catalog_responses.categories()
+    readiness['warmupMs'] = round((time.perf_counter() - start) * 1000, 1)
+    readiness['ready'] = True
+    print(f"Warm-up done in {readiness['warmupMs']}ms (pid {os.getpid()}): {timer.summary()}")
+
+def before_fork():
+    """Close the SQLite connections opened while loading, so forked workers open their own."""
+    db.close_connections()
+    session_store.close()
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok'})
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    body = {'ready': readiness['ready'], 'warmupMs': readiness['warmupMs'], 'pid': os.getpid()}
+    return jsonify(body), 200 if readiness['ready'] else 503
 
 if __name__ == "__main__":
+    # Development server; production runs gunicorn with wsgi.py and gunicorn.conf.py
+    warm_up()
     app.run(host='0.0.0.0', port=8000)
\ No newline at end of file
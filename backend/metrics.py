@@ -0,0 +1,244 @@
+import contextvars
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, g, request
+
+# Seconds; covers a local SQLite query up to a slow LLM call
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, math.inf)
+
+
+def _labels_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Counters and histograms rendered in the Prometheus text format.
+
+    Values held elsewhere (cache and session stats) are read at scrape time
+    through ``add_collector`` callbacks instead of being mirrored here.
+    """
+
+    def __init__(self):
+        self._descriptions = {}
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._descriptions[name] = (kind, help_text, buckets)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        buckets = self._descriptions[name][2] or DURATION_BUCKETS
+        key = (name, _labels_key(labels))
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = {"counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def add_collector(self, collect):
+        """``collect()`` yields ``(name, kind, help, labels, value)`` samples at scrape time."""
+        self._collectors.append(collect)
+
+    def render(self):
+        families = {}
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                families.setdefault(name, []).append((name, labels, value))
+            for (name, labels), state in self._histograms.items():
+                samples = families.setdefault(name, [])
+                buckets = self._descriptions[name][2] or DURATION_BUCKETS
+                cumulative = 0
+                for bound, count in zip(buckets, state["counts"]):
+                    cumulative += count
+                    samples.append((f"{name}_bucket", labels + (("le", _format_value(bound)),), cumulative))
+                samples.append((f"{name}_sum", labels, state["sum"]))
+                samples.append((f"{name}_count", labels, state["count"]))
+        descriptions = {name: (kind, help_text) for name, (kind, help_text, _) in self._descriptions.items()}
+
+        for collect in self._collectors:
+            try:
+                for name, kind, help_text, labels, value in collect():
+                    descriptions.setdefault(name, (kind, help_text))
+                    families.setdefault(name, []).append((name, _labels_key(labels), value))
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+
+        lines = []
+        for name, samples in families.items():
+            kind, help_text = descriptions.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.describe("decochat_stage_duration_seconds", "histogram", "Time spent in each named request stage.")
+registry.describe("decochat_request_duration_seconds", "histogram", "HTTP request handling time by endpoint.")
+registry.describe("decochat_requests_total", "counter", "HTTP requests by endpoint and status.")
+registry.describe("decochat_filter_fallback_total", "counter",
+                  "Chat filters that failed or matched nothing; rules_no_rows turns go on to the LLM filter, "
+                  "the rest search the full catalog.")
+registry.describe("decochat_filter_discarded_total", "counter",
+                  "LLM filter calls started alongside the query embedding and then not needed (response cache hit).")
+registry.describe("decochat_llm_tokens_total", "counter", "LLM tokens reported by the provider, by call purpose.")
+registry.describe("decochat_llm_calls_total", "counter",
+                  "LLM gateway calls by purpose and result: ok, error, coalesced, shed or timeout.")
+
+_current_timer = contextvars.ContextVar("stage_timer", default=None)
+
+
+class StageTimer:
+    """Wall-clock milliseconds per named stage of one request.
+
+    Every stage is also observed in the ``decochat_stage_duration_seconds``
+    histogram. Stage names go into Server-Timing, so use ``[a-z_]``.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.timings[name] = self.timings.get(name, 0.0) + elapsed * 1000
+            registry.observe("decochat_stage_duration_seconds", elapsed, stage=name)
+
+    def summary(self):
+        return ", ".join(f"{name} {ms:.1f}ms" for name, ms in self.timings.items())
+
+    def server_timing(self):
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.timings.items())
+
+
+def request_timer():
+    """The current request's StageTimer, or a fresh one outside a request."""
+    timer = _current_timer.get()
+    if timer is None:
+        timer = StageTimer()
+        _current_timer.set(timer)
+    return timer
+
+
+def stage(name):
+    """Time a stage of the current request: ``with metrics.stage('sql_llm'): ...``."""
+    return request_timer().stage(name)
+
+
+def submit(pool, fn, *args):
+    """``pool.submit`` that keeps the caller's request timer for stages run in the pool."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def record_llm_usage(purpose, message):
+    """Count the tokens the provider reported on a LangChain message or final stream chunk."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if not usage:
+        token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        usage = {"input_tokens": token_usage.get("prompt_tokens"), "output_tokens": token_usage.get("completion_tokens")}
+    for kind, key in (("prompt", "input_tokens"), ("completion", "output_tokens")):
+        if usage.get(key):
+            registry.inc("decochat_llm_tokens_total", usage[key], purpose=purpose, kind=kind)
+
+
+def _start_profiler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return "cprofile", profiler
+    profiler = Profiler(interval=0.001, async_mode="disabled")
+    profiler.start()
+    return "pyinstrument", profiler
+
+
+def _save_profile(kind, profiler, directory):
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unknown'}-{os.getpid()}")
+    if kind == "pyinstrument":
+        profiler.stop()
+        path = f"{base}.html"
+        with open(path, "w") as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        path = f"{base}.pstats"
+        profiler.dump_stats(path)
+    return path
+
+
+def instrument_app(app, profile_dir=None):
+    """Add per-request stage timing, Server-Timing headers, ``/metrics`` and opt-in profiling.
+
+    With METRICS_PROFILING=1, a request carrying ``X-Profile: 1`` (or
+    ``?profile=1``) runs under pyinstrument's sampling profiler (cProfile
+    if pyinstrument is not installed); the report path is returned in the
+    ``X-Profile-Report`` header.
+    """
+    profiling = os.getenv("METRICS_PROFILING", "0") == "1"
+    profile_dir = profile_dir or os.getenv("METRICS_PROFILE_DIR", "profiles")
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_start = time.perf_counter()
+        _current_timer.set(StageTimer())
+        g.profiler = None
+        if profiling and (request.headers.get("X-Profile") == "1" or request.args.get("profile") == "1"):
+            g.profiler = _start_profiler()
+
+    @app.after_request
+    def finish_request_metrics(response):
+        endpoint = request.endpoint or "unknown"
+        timer = _current_timer.get()
+        if timer is not None and timer.timings:
+            response.headers["Server-Timing"] = timer.server_timing()
+        elapsed = time.perf_counter() - g.get("request_start", time.perf_counter())
+        registry.observe("decochat_request_duration_seconds", elapsed, endpoint=endpoint)
+        registry.inc("decochat_requests_total", endpoint=endpoint, status=response.status_code)
+        if g.get("profiler"):
+            response.headers["X-Profile-Report"] = _save_profile(*g.profiler, profile_dir)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,116 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from vector_index import normalize_rows
+
+
+def normalize_query(text):
+    """Lowercase, strip punctuation and collapse whitespace."""
+    text = re.sub(r"[^\w\s$.]", " ", text.lower())
+    return " ".join(text.split()).strip(" .")
+
+
+def _numbers(normalized):
+    # Queries that differ only in a budget or size must never share an answer
+    return tuple(re.findall(r"\d+(?:\.\d+)?", normalized))
+
+
+class SemanticResponseCache:
+    """LRU + TTL cache of chat answers, matched by query-embedding similarity.
+
+    A lookup first tries the exact normalized query, then the most similar
+    cached query above ``threshold`` among entries with the same numbers.
+    Every entry is tagged with a version (catalog, prompts and encoder);
+    asking with a different version drops the whole cache.
+    """
+
+    def __init__(self, max_entries=512, ttl=3600, threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.version = None
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                print(f"Response cache invalidated: version {self.version} -> {version}")
+            self._entries.clear()
+            self._matrix = None
+            self.version = version
+
+    def _expire(self, now):
+        expired = [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self.evictions += len(expired)
+            self._matrix = None
+
+    def _similar_key(self, normalized, vector):
+        if vector is None or not self._entries:
+            return None
+        keys = list(self._entries)
+        if self._matrix is None:
+            self._matrix = np.vstack([self._entries[key]["vector"] for key in keys])
+        scores = self._matrix @ normalize_rows(vector)[0]
+        numbers = _numbers(normalized)
+        for i in np.argsort(-scores):
+            if scores[i] < self.threshold:
+                break
+            if self._entries[keys[i]]["numbers"] == numbers:
+                return keys[i]
+        return None
+
+    def get(self, query, vector=None, version=None):
+        """The cached value for ``query`` or a near-identical one, else None."""
+        normalized = normalize_query(query)
+        with self._lock:
+            self._check_version(version)
+            self._expire(time.monotonic())
+            key = normalized if normalized in self._entries else self._similar_key(normalized, vector)
+            if key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if key != normalized:
+                self.similar_hits += 1
+            return self._entries[key]["value"]
+
+    def put(self, query, vector, value, version=None):
+        normalized = normalize_query(query)
+        with self._lock:
+            self._check_version(version)
+            self._entries[normalized] = {
+                "vector": normalize_rows(vector)[0],
+                "numbers": _numbers(normalized),
+                "value": value,
+                "created": time.monotonic(),
+            }
+            self._entries.move_to_end(normalized)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "similarHits": self.similar_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "version": self.version,
+            }
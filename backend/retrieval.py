@@ -0,0 +1,129 @@
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# Field weights: a product name match matters more than a word in its description
+FIELD_WEIGHTS = {"name": 3, "category": 1, "designer": 1, "short_description": 1}
+_TOKEN = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+# Letters NFKD does not split into base letter + accent
+_FOLD = str.maketrans({"ø": "o", "æ": "ae", "œ": "oe", "ß": "ss", "ð": "d", "þ": "th", "ł": "l"})
+
+
+def tokenize(text):
+    """Lowercase, accent-folded words and numbers; "GRÖNLID 120x51cm" -> gronlid, 120, x, 51, cm."""
+    text = unicodedata.normalize("NFKD", str(text).lower().translate(_FOLD))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN.findall(text)
+
+
+class LexicalIndex:
+    """In-memory BM25 over name, short_description, category and designer.
+
+    Postings are stored per term as flat NumPy arrays holding each
+    document's precomputed BM25 weight, so scoring a query is one
+    ``bincount`` over the postings of its terms.
+    """
+
+    def __init__(self, df, k1=1.2, b=0.75):
+        self.ids = df.index.to_numpy(dtype=np.int64)
+        self._positions = pd.Index(self.ids)
+        vocabulary = {}
+        doc_terms = []
+        lengths = np.zeros(len(df), dtype=np.float32)
+        for doc, row in enumerate(df[list(FIELD_WEIGHTS)].itertuples(index=False)):
+            counts = {}
+            for field, value in zip(FIELD_WEIGHTS, row):
+                if isinstance(value, str):
+                    for token in tokenize(value):
+                        term = vocabulary.setdefault(token, len(vocabulary))
+                        counts[term] = counts.get(term, 0) + FIELD_WEIGHTS[field]
+            lengths[doc] = sum(counts.values())
+            doc_terms.extend((term, doc, tf) for term, tf in counts.items())
+
+        postings = np.array(doc_terms, dtype=np.float64).reshape(-1, 3)
+        postings = postings[np.argsort(postings[:, 0], kind="stable")]
+        terms = postings[:, 0].astype(np.int64)
+        self.docs = postings[:, 1].astype(np.int64)
+        tf = postings[:, 2]
+        doc_freq = np.bincount(terms, minlength=len(vocabulary))
+        self.offsets = np.concatenate([[0], np.cumsum(doc_freq)])
+
+        idf = np.log1p((len(df) - doc_freq + 0.5) / (doc_freq + 0.5))
+        norm = k1 * (1 - b + b * lengths[self.docs] / max(lengths.mean(), 1.0))
+        self.weights = (idf[terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        self.vocabulary = vocabulary
+
+    def scores(self, query):
+        """BM25 score of every document for ``query``."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            scores += np.bincount(self.docs[start:end], weights=self.weights[start:end], minlength=len(self.ids)).astype(np.float32)
+        return scores
+
+    def search(self, query, k=5, row_ids=None):
+        """Top-k ``(row_id, score)`` pairs with a non-zero score, restricted to ``row_ids`` when given."""
+        scores = self.scores(query)
+        if row_ids is not None:
+            candidates = self._positions.get_indexer(sorted(row_ids))
+            candidates = candidates[candidates >= 0]
+        else:
+            candidates = np.flatnonzero(scores)
+        candidates = candidates[scores[candidates] > 0]
+        k = min(k, len(candidates))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores[candidates], k - 1)[:k]
+        top = candidates[top[np.argsort(-scores[candidates[top]], kind="stable")]]
+        return [(int(self.ids[p]), float(scores[p])) for p in top]
+
+
+def reciprocal_rank_fusion(rankings, weights=None, k=60):
+    """Fuse ranked ``(row_id, score)`` lists by summing ``weight / (k + rank)``."""
+    weights = weights or [1.0] * len(rankings)
+    fused = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, (row_id, _) in enumerate(ranking, start=1):
+            fused[row_id] = fused.get(row_id, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever:
+    """Dense and BM25 retrieval over the same rows, combined by reciprocal-rank fusion.
+
+    Structured filters arrive as ``row_ids`` and restrict both retrievers
+    before ranking, so fusion only sees rows that pass the filters.
+    """
+
+    def __init__(self, dense_index, lexical_index, depth=50, dense_weight=1.0, lexical_weight=1.0):
+        self.dense_index = dense_index
+        self.lexical_index = lexical_index
+        self.depth = depth
+        self.weights = [dense_weight, lexical_weight]
+
+    def search(self, query, query_vector, k=5, row_ids=None):
+        depth = max(self.depth, k)
+        dense = self.dense_index.search(query_vector, k=depth, row_ids=row_ids)
+        lexical = self.lexical_index.search(query, k=depth, row_ids=row_ids)
+        return reciprocal_rank_fusion([dense, lexical], self.weights)[:k]
+
+    def search_many(self, queries, query_vectors, k=5):
+        """Unfiltered ``search`` for a batch of queries, scoring the dense matrix once for all."""
+        depth = max(self.depth, k)
+        dense = self.dense_index.search_many(query_vectors, k=depth)
+        return [
+            reciprocal_rank_fusion([ranking, self.lexical_index.search(query, k=depth)], self.weights)[:k]
+            for query, ranking in zip(queries, dense)
+        ]
+
+    @staticmethod
+    def restrict(candidates, row_ids, k=5):
+        """The best ``k`` unfiltered candidates that pass ``row_ids``, or None if fewer pass."""
+        if row_ids is None:
+            return candidates[:k]
+        kept = [candidate for candidate in candidates if candidate[0] in row_ids]
+        return kept[:k] if len(kept) >= k else None
@@ -0,0 +1,241 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def _turn_size(query, response):
+    return len(query.encode("utf-8")) + len(response.encode("utf-8"))
+
+
+class InMemorySessionStore:
+    """Per-process conversation histories with bounded size.
+
+    Each session keeps at most ``max_turns`` turns, is dropped after
+    ``idle_ttl`` seconds without use, and the least recently used sessions are
+    evicted once all histories together exceed ``max_bytes``.
+    """
+
+    def __init__(self, max_turns=20, idle_ttl=3600, max_bytes=64 * 1024 * 1024):
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.counters = {"expired": 0, "evicted": 0, "truncatedTurns": 0}
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, chat_id):
+        session = self._sessions.pop(chat_id)
+        self._bytes -= session["bytes"]
+
+    def _expire(self, now):
+        # Sessions are kept in last-used order, so the idle ones are at the front
+        while self._sessions:
+            chat_id, session = next(iter(self._sessions.items()))
+            if now - session["last_used"] <= self.idle_ttl:
+                break
+            self._drop(chat_id)
+            self.counters["expired"] += 1
+
+    def get_history(self, chat_id):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            session = self._sessions.get(chat_id)
+            if session is None:
+                return []
+            session["last_used"] = now
+            self._sessions.move_to_end(chat_id)
+            return list(session["turns"])
+
+    def append_turn(self, chat_id, query, response):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            session = self._sessions.setdefault(chat_id, {"turns": [], "bytes": 0, "last_used": now})
+            session["turns"].append({"query": query, "response": response})
+            size = _turn_size(query, response)
+            session["bytes"] += size
+            self._bytes += size
+            while len(session["turns"]) > self.max_turns:
+                old = session["turns"].pop(0)
+                size = _turn_size(old["query"], old["response"])
+                session["bytes"] -= size
+                self._bytes -= size
+                self.counters["truncatedTurns"] += 1
+            session["last_used"] = now
+            self._sessions.move_to_end(chat_id)
+            while self._bytes > self.max_bytes and len(self._sessions) > 1:
+                self._drop(next(iter(self._sessions)))
+                self.counters["evicted"] += 1
+
+    def reset(self, chat_id):
+        with self._lock:
+            if chat_id in self._sessions:
+                self._drop(chat_id)
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._sessions), "bytes": self._bytes, **self.counters}
+
+    def close(self):
+        """Nothing to release; histories live in this process."""
+
+
+class SQLiteSessionStore:
+    """Conversation histories in a local SQLite file shared by every worker on the host.
+
+    Same limits as ``InMemorySessionStore``; idle and over-budget sessions are
+    swept at most every ``sweep_interval`` seconds per process.
+    """
+
+    def __init__(self, path="sessions.db", max_turns=20, idle_ttl=3600,
+                 max_bytes=64 * 1024 * 1024, sweep_interval=30):
+        self.path = path
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.counters = {"expired": 0, "evicted": 0, "truncatedTurns": 0}
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        self._counter_lock = threading.Lock()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS session_turns (
+                chat_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                turn TEXT NOT NULL,
+                bytes INTEGER NOT NULL,
+                PRIMARY KEY (chat_id, seq)
+            );
+            CREATE TABLE IF NOT EXISTS sessions (
+                chat_id TEXT PRIMARY KEY,
+                last_used REAL NOT NULL,
+                bytes INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_last_used ON sessions(last_used);
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._conn())
+
+    def _count(self, name, amount):
+        if amount > 0:
+            with self._counter_lock:
+                self.counters[name] += amount
+
+    def _delete_sessions(self, conn, chat_ids):
+        conn.executemany("DELETE FROM session_turns WHERE chat_id = ?", [(c,) for c in chat_ids])
+        conn.executemany("DELETE FROM sessions WHERE chat_id = ?", [(c,) for c in chat_ids])
+
+    def _sweep(self, conn, now):
+        idle = [row[0] for row in conn.execute(
+            "SELECT chat_id FROM sessions WHERE last_used < ?", (now - self.idle_ttl,))]
+        self._delete_sessions(conn, idle)
+        self._count("expired", len(idle))
+
+        total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM sessions").fetchone()[0]
+        evicted = []
+        if total > self.max_bytes:
+            for chat_id, size in conn.execute("SELECT chat_id, bytes FROM sessions ORDER BY last_used"):
+                if total <= self.max_bytes:
+                    break
+                evicted.append(chat_id)
+                total -= size
+        self._delete_sessions(conn, evicted)
+        self._count("evicted", len(evicted))
+
+    def get_history(self, chat_id):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT last_used FROM sessions WHERE chat_id = ?", (chat_id,)).fetchone()
+            if row is None:
+                return []
+            if now - row[0] > self.idle_ttl:
+                self._delete_sessions(conn, [chat_id])
+                self._count("expired", 1)
+                return []
+            conn.execute("UPDATE sessions SET last_used = ? WHERE chat_id = ?", (now, chat_id))
+            rows = conn.execute(
+                "SELECT turn FROM session_turns WHERE chat_id = ? ORDER BY seq", (chat_id,)).fetchall()
+        return [json.loads(turn) for (turn,) in rows]
+
+    def append_turn(self, chat_id, query, response):
+        now = time.time()
+        turn = json.dumps({"query": query, "response": response})
+        size = _turn_size(query, response)
+        with self._transaction() as conn:
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM session_turns WHERE chat_id = ?", (chat_id,)).fetchone()[0]
+            conn.execute("INSERT INTO session_turns (chat_id, seq, turn, bytes) VALUES (?, ?, ?, ?)",
+                         (chat_id, seq, turn, size))
+            truncated = conn.execute(
+                "DELETE FROM session_turns WHERE chat_id = ? AND seq <= ?", (chat_id, seq - self.max_turns)).rowcount
+            self._count("truncatedTurns", truncated)
+            conn.execute(
+                "INSERT INTO sessions (chat_id, last_used, bytes) "
+                "SELECT ?, ?, SUM(bytes) FROM session_turns WHERE chat_id = ? "
+                "ON CONFLICT(chat_id) DO UPDATE SET last_used = excluded.last_used, bytes = excluded.bytes",
+                (chat_id, now, chat_id))
+            if time.monotonic() - self._last_sweep > self.sweep_interval:
+                self._last_sweep = time.monotonic()
+                self._sweep(conn, now)
+
+    def reset(self, chat_id):
+        with self._transaction() as conn:
+            self._delete_sessions(conn, [chat_id])
+
+    def stats(self):
+        with self._transaction() as conn:
+            sessions, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions").fetchone()
+        with self._counter_lock:
+            return {"backend": "sqlite", "sessions": sessions, "bytes": total, **self.counters}
+
+    def close(self):
+        """Close this thread's connection; the next call reopens it."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class _Transaction:
+    """``with`` wrapper running a block in one immediate write transaction."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def create_session_store():
+    """Build the store selected by SESSION_BACKEND ('memory' or 'sqlite')."""
+    limits = {
+        "max_turns": int(os.getenv("SESSION_MAX_TURNS", "20")),
+        "idle_ttl": float(os.getenv("SESSION_IDLE_TTL", "3600")),
+        "max_bytes": int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+    }
+    backend = os.getenv("SESSION_BACKEND", "memory")
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB_PATH", "sessions.db"), **limits)
+    if backend != "memory":
+        raise ValueError(f"Unknown SESSION_BACKEND '{backend}', expected 'memory' or 'sqlite'")
+    return InMemorySessionStore(**limits)
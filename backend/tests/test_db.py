@@ -0,0 +1,57 @@
+"""Read-only catalog queries: id-only fetches of generated SQL and query timeouts."""
+import sqlite3
+import time
+import pytest
+import db
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = str(tmp_path / "furniture.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE furniture (row_id INTEGER PRIMARY KEY, item_id INTEGER, name TEXT, "
+                     "category TEXT, price REAL)")
+        conn.executemany("INSERT INTO furniture VALUES (?, ?, ?, ?, ?)", [
+            (0, 100, "KIVIK", "Sofas & armchairs", 499.0),
+            (1, 101, "EKTORP", "Sofas & armchairs", 899.0),
+            (2, 102, "BILLY", "Bookcases & shelving units", 59.0),
+        ])
+    yield path
+    db.close_connections()
+
+
+def test_columns_come_from_the_cursor(catalog):
+    assert db.columns("SELECT * FROM furniture", path=catalog) == ["row_id", "item_id", "name", "category", "price"]
+    assert db.columns("SELECT item_id FROM furniture -- sofas", path=catalog) == ["item_id"]
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM furniture WHERE category LIKE '%Sofa%' AND price <= 500;",
+     {"row_id": [0]}),
+    ("SELECT name, row_id FROM furniture WHERE price < 100 -- cheap",
+     {"row_id": [2]}),
+    ("SELECT item_id, name FROM furniture WHERE category LIKE '%Sofa%' ORDER BY item_id",
+     {"item_id": [100, 101], "name": ["KIVIK", "EKTORP"]}),
+])
+def test_query_ids_df_reads_only_the_id_column(catalog, sql, expected):
+    assert db.query_ids_df(sql, path=catalog).to_dict("list") == expected
+
+
+def test_broken_sql_still_raises(catalog):
+    with pytest.raises(sqlite3.OperationalError, match="no such column: colour"):
+        db.query_ids_df("SELECT * FROM furniture WHERE colour = 'red'", path=catalog)
+
+
+# Counts forever; only the deadline stops it
+ENDLESS = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT count(*) FROM n"
+
+
+@pytest.mark.parametrize("run", [db.query, db.query_one, db.query_df, db.query_ids_df])
+def test_slow_queries_time_out(catalog, run):
+    start = time.perf_counter()
+    with pytest.raises(db.QueryTimeoutError):
+        run(ENDLESS, timeout=0.05, path=catalog)
+
+    assert time.perf_counter() - start < 1
+    # The deadline is per query: the connection still answers the next one
+    assert db.query("SELECT count(*) FROM furniture", path=catalog) == [(3,)]
@@ -0,0 +1,134 @@
+"""Query embedding cache: key normalization, LRU, micro-batched misses and failure handling."""
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+import embedding_cache
+from embedding_cache import CachedEmbeddings
+
+
+class FakeEncoder:
+    """Deterministic ``embed_documents`` recording each batch it is given."""
+
+    def __init__(self, latency=0.0, error=None):
+        self.latency = latency
+        self.error = error
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+        time.sleep(self.latency)
+        if self.error:
+            raise self.error
+        return [vector(text) for text in texts]
+
+
+def vector(text):
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return np.frombuffer(digest, dtype=np.uint8).astype(np.float32)
+
+
+def embed_all(cache, texts):
+    """``embed_query`` for every text at once; each call must finish within a second."""
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        futures = [pool.submit(cache.embed_query, text) for text in texts]
+        return [future.result(timeout=1) for future in futures]
+
+
+def test_normalized_queries_share_one_entry():
+    encoder = FakeEncoder()
+    cache = CachedEmbeddings(encoder, "minilm", uncased=True)
+
+    first = cache.embed_query("  Oak   dining TABLE ")
+    again = cache.embed_query("oak dining table")
+
+    assert again is first
+    np.testing.assert_array_equal(first, vector("oak dining table"))
+    assert encoder.batches == [["oak dining table"]]
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+    assert not first.flags.writeable
+
+
+def test_least_recently_used_entry_is_evicted():
+    encoder = FakeEncoder()
+    cache = CachedEmbeddings(encoder, "minilm", max_entries=2)
+
+    for text in ("sofa", "bed", "sofa", "lamp", "sofa", "bed"):
+        cache.embed_query(text)
+
+    assert encoder.batches == [["sofa"], ["bed"], ["lamp"], ["bed"]]
+    assert cache.stats()["entries"] == 2
+
+
+def test_concurrent_misses_are_encoded_in_one_batch():
+    encoder = FakeEncoder(latency=0.05)
+    cache = CachedEmbeddings(encoder, "minilm", batch_window=0.05)
+    texts = [f"chair {i}" for i in range(6)] + ["chair 0"] * 4
+
+    vectors = embed_all(cache, texts)
+
+    assert sorted(map(sorted, encoder.batches)) == [sorted(f"chair {i}" for i in range(6))]
+    for text, result in zip(texts, vectors):
+        np.testing.assert_array_equal(result, vector(text))
+
+
+def test_batches_are_split_at_max_batch():
+    encoder = FakeEncoder()
+    cache = CachedEmbeddings(encoder, "minilm", batch_window=0.05, max_batch=4)
+
+    embed_all(cache, [f"shelf {i}" for i in range(10)])
+
+    assert sorted(len(batch) for batch in encoder.batches) == [2, 4, 4]
+
+
+def test_embed_many_encodes_uncached_texts_together_in_order():
+    encoder = FakeEncoder()
+    cache = CachedEmbeddings(encoder, "minilm")
+    cache.embed_query("desk")
+
+    vectors = cache.embed_many(["bed", "desk", "lamp", "bed"])
+
+    assert encoder.batches == [["desk"], ["bed", "lamp"]]
+    for text, result in zip(["bed", "desk", "lamp", "bed"], vectors):
+        np.testing.assert_array_equal(result, vector(text))
+
+
+def test_encoder_errors_reach_every_waiter_and_are_not_cached():
+    encoder = FakeEncoder(latency=0.02, error=RuntimeError("model not loaded"))
+    cache = CachedEmbeddings(encoder, "minilm", batch_window=0.02)
+
+    with pytest.raises(RuntimeError, match="model not loaded"):
+        embed_all(cache, ["sofa"] * 3 + ["bed"])
+    assert len(encoder.batches) == 1
+
+    encoder.error = None
+    np.testing.assert_array_equal(embed_all(cache, ["sofa"])[0], vector("sofa"))
+
+
+def test_wrong_vector_count_fails_instead_of_hanging():
+    encoder = FakeEncoder()
+    encoder.embed_documents = lambda texts: [vector(text) for text in texts][:-1]
+    cache = CachedEmbeddings(encoder, "minilm", batch_window=0.02)
+
+    with pytest.raises(ValueError, match="1 vectors for 2 texts"):
+        embed_all(cache, ["sofa", "bed"])
+    assert cache.stats()["entries"] == 0
+
+
+def test_failure_outside_the_encoder_does_not_block_later_misses(monkeypatch):
+    cache = CachedEmbeddings(FakeEncoder(), "minilm", batch_window=0.02)
+
+    def broken_observe(histogram, value):
+        raise ZeroDivisionError("metrics bug")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(embedding_cache, "_observe", broken_observe)
+        with pytest.raises(ZeroDivisionError):
+            embed_all(cache, ["sofa", "bed", "lamp"])
+
+    np.testing.assert_array_equal(embed_all(cache, ["sofa"])[0], vector("sofa"))
+    assert cache._pending == {} and not cache._encoding
@@ -0,0 +1,42 @@
+"""Every non-reference encoder backend must agree with fp32 torch.
+
+Skipped when the backend's runtime is not installed or the model cannot be
+loaded (e.g. offline without a Hugging Face cache).
+"""
+import os
+import pytest
+
+pytest.importorskip("langchain_huggingface")
+pytest.importorskip("sentence_transformers")
+
+from benchmarks.encoder_parity import MIN_COSINE, MIN_OVERLAP, parity
+from catalog_db import build_catalog_db, csv_file, load_catalog_df
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNTIMES = {
+    "torch-int8": ["torch"],
+    "onnx": ["onnxruntime", "optimum.onnxruntime"],
+    "onnx-int8": ["onnxruntime", "optimum.onnxruntime"],
+}
+
+
+@pytest.fixture(scope="module")
+def catalog(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("catalog") / "furniture.db")
+    build_catalog_db(os.path.join(BACKEND_DIR, csv_file), db_path)
+    return load_catalog_df(db_path)
+
+
+@pytest.mark.parametrize("backend", sorted(RUNTIMES))
+def test_backend_matches_torch_reference(backend, catalog):
+    for module in RUNTIMES[backend]:
+        pytest.importorskip(module)
+    try:
+        result = parity(backend, catalog=catalog)
+    except OSError as e:
+        pytest.skip(f"embedding model unavailable: {e}")
+
+    assert result["doc_cosine"].min() >= MIN_COSINE
+    assert result["query_cosine"].min() >= MIN_COSINE
+    assert result["reembedded_overlap"] >= MIN_OVERLAP
+    assert result["reference_overlap"] >= MIN_OVERLAP
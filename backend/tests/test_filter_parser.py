@@ -0,0 +1,94 @@
+"""Rule-based chat filters: what is read as a price, a size or a category, and when to defer to the LLM."""
+import pytest
+from filter_parser import FilterParser
+
+parser = FilterParser(designers=["Ehlén Johansson", "IKEA of Sweden"])
+
+SOFAS = "Sofas & armchairs"
+TABLES = "Tables & desks"
+
+
+@pytest.mark.parametrize("text, categories, min_price, max_price", [
+    ("sofa under $500", [SOFAS], None, 500),
+    ("sofa for 500 dollars", [SOFAS], None, 500),
+    ("wardrobe for 1,200 sar", ["Wardrobes"], None, 1200),
+    ("chair at least €50", ["Chairs"], 50, None),
+    ("budget of 300 for a bed", ["Beds"], None, 300),
+    ("my budget is under 800 for a couch", [SOFAS], None, 800),
+    ("500 budget armchair", [SOFAS], None, 500),
+    ("bookcase between $100 and $200", ["Bookcases & shelving units"], 100, 200),
+    ("desk $150-$300", [TABLES], 150, 300),
+])
+def test_prices_with_a_currency_or_budget_word(text, categories, min_price, max_price):
+    filters = parser.parse(text)
+
+    assert filters.confident, filters.reason
+    assert filters.categories == categories
+    assert (filters.min_price, filters.max_price) == (min_price, max_price)
+
+
+@pytest.mark.parametrize("text, reason, max_price", [
+    ("dining table for up to 4 people", "counted people", None),
+    ("a chest with at least 4 drawers", "counted drawers", None),
+    ("desk within 2 weeks delivery", "counted weeks", None),
+    ("dining table for 6-seater", "counted seater", None),
+    ("bookcase with 5 shelves under $100", "counted shelves", 100),
+    ("3 seat sofa under $700", "counted seat", 700),
+    ("sofa under 500", "unparsed numbers", None),
+    ("coffee table 100 to 200", "unparsed numbers", None),
+])
+def test_counts_and_bare_numbers_are_not_prices(text, reason, max_price):
+    filters = parser.parse(text)
+
+    assert not filters.confident
+    assert filters.reason.startswith(reason)
+    assert filters.min_price is None
+    assert filters.max_price == max_price
+
+
+@pytest.mark.parametrize("text, dimensions", [
+    ("desk at least 120cm wide", {"width": [120, None]}),
+    ("wardrobe under 2 m tall", {"height": [None, 200]}),
+    ("table between 100 and 150 cm wide", {"width": [100, 150]}),
+    ("shelf with a depth of at most 30 cm", {"depth": [None, 30]}),
+    ("sofa 200cm wide", {"width": [pytest.approx(180), pytest.approx(220)]}),
+])
+def test_dimensions(text, dimensions):
+    filters = parser.parse(text)
+
+    assert filters.confident, filters.reason
+    assert filters.dimensions == dimensions
+    assert filters.max_price is None
+
+
+@pytest.mark.parametrize("text, reason", [
+    ("sofa but not leather", "unsupported wording: not"),
+    ("a table or a desk", "unsupported wording: or"),
+    ("something cosy for reading", "no filters found"),
+])
+def test_wording_the_rules_cannot_express(text, reason):
+    filters = parser.parse(text)
+
+    assert not filters.confident
+    assert filters.reason == reason
+
+
+def test_designer_needs_a_cue():
+    assert parser.parse("sofa by Johansson").designers == ["Johansson"]
+    assert parser.parse("johansson sofa").designers == []
+
+
+def test_follow_up_keeps_earlier_filters():
+    filters = parser.parse_conversation("under $300", ["a bed"])
+
+    assert filters.confident
+    assert filters.categories == ["Beds"]
+    assert filters.max_price == 300
+
+
+def test_to_sql_is_parameterized():
+    sql, params = parser.parse("sofa by Johansson under $900 at least 80 cm deep").to_sql()
+
+    assert sql == ("SELECT row_id FROM furniture WHERE category IN (?) AND price <= ? "
+                   "AND depth >= ? AND (designer LIKE ?)")
+    assert params == [SOFAS, 900, 80, "%Johansson%"]
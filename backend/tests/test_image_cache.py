@@ -0,0 +1,154 @@
+"""Perceptual image cache: near-duplicate matching, flat images, layers and the shared JSON file."""
+import io
+import json
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+from image_cache import MAX_DISTANCE, PerceptualImageCache, dhash, fingerprint
+
+WHITE = (245, 245, 245)
+
+
+def jpeg(image, quality=85, size=None):
+    if size:
+        image = image.resize(size)
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+def key(image, **encoding):
+    """``(hash, colors)`` of the image saved as a JPEG."""
+    return fingerprint(jpeg(image, **encoding))
+
+
+def reupload(image):
+    """The same picture shrunk and recompressed, as a second upload would be."""
+    return key(image, quality=40, size=(320, 240))
+
+
+def photo(seed):
+    """A smooth, textured stand-in for a room photo."""
+    noise = np.random.default_rng(seed).integers(0, 256, size=(60, 80, 3), dtype=np.uint8)
+    return Image.fromarray(noise).resize((640, 480)).filter(ImageFilter.GaussianBlur(8))
+
+
+def product(box, fill):
+    """A single flat-coloured product on a white background."""
+    image = Image.new("RGB", (640, 480), WHITE)
+    ImageDraw.Draw(image).rectangle(box, fill=fill)
+    return image
+
+
+def solid(color):
+    return Image.new("RGB", (640, 480), color)
+
+
+def distance(a, b):
+    return (a ^ b).bit_count()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PerceptualImageCache(path=str(tmp_path / "image_cache.json"), max_entries=3, flush_interval=60)
+
+
+def test_dhash_survives_recompression_and_resizing():
+    original = dhash(jpeg(photo(1)))
+
+    assert distance(original, dhash(jpeg(photo(1), quality=40, size=(320, 240)))) <= MAX_DISTANCE
+    assert distance(original, dhash(jpeg(photo(2)))) > 2 * MAX_DISTANCE
+
+
+def test_flat_images_share_a_dhash_but_not_colors():
+    hashes, colors = zip(*(key(solid(color)) for color in [(255, 255, 255), (30, 30, 30), (200, 150, 100)]))
+
+    assert set(hashes) == {0}
+    assert len(set(map(tuple, colors))) == 3
+
+
+def test_fingerprint_hash_is_the_dhash():
+    data = jpeg(photo(3))
+
+    assert distance(fingerprint(data)[0], dhash(data)) <= 2
+
+
+def test_reuploaded_photo_hits_and_another_misses(cache):
+    image_hash, colors = key(photo(1))
+    cache.put(image_hash, "care_guide", {"materials": "oak"}, colors)
+
+    again_hash, again_colors = reupload(photo(1))
+    other_hash, other_colors = key(photo(2))
+    assert cache.get(again_hash, "care_guide", again_colors) == {"materials": "oak"}
+    assert cache.get(other_hash, "care_guide", other_colors) is None
+
+
+@pytest.mark.parametrize("first, second", [
+    (solid((255, 255, 255)), solid((30, 30, 30))),
+    (solid((200, 150, 100)), solid((90, 120, 200))),
+    # A wide sideboard and a narrow cabinet in the same red
+    (product([80, 60, 320, 260], (150, 40, 40)), product([200, 60, 320, 260], (150, 40, 40))),
+    (product([80, 160, 320, 360], (30, 90, 30)), product([200, 160, 320, 360], (200, 180, 40))),
+])
+def test_unrelated_low_detail_images_do_not_share_answers(cache, first, second):
+    (first_hash, first_colors), (second_hash, second_colors) = key(first), key(second)
+    # The hashes alone would call these the same image
+    assert distance(first_hash, second_hash) <= MAX_DISTANCE
+
+    cache.put(first_hash, "care_guide", "first", first_colors)
+
+    again_hash, again_colors = reupload(first)
+    assert cache.get(second_hash, "care_guide", second_colors) is None
+    assert cache.get(again_hash, "care_guide", again_colors) == "first"
+
+
+def test_same_hash_different_image_replaces_the_entry(cache):
+    white, black = key(solid((255, 255, 255))), key(solid((30, 30, 30)))
+    cache.put(white[0], "vision", "white labels", white[1])
+    cache.put(white[0], "care_guide", "white guide", white[1])
+
+    cache.put(black[0], "vision", "black labels", black[1])
+
+    assert cache.get(black[0], "vision", black[1]) == "black labels"
+    assert cache.get(black[0], "care_guide", black[1]) is None
+    assert cache.get(white[0], "vision", white[1]) is None
+
+
+def test_layers_are_independent(cache):
+    image_hash, colors = key(photo(1))
+    cache.put(image_hash, "vision:care_guide", ["Chair"], colors)
+
+    assert cache.get(image_hash, "vision:care_guide", colors) == ["Chair"]
+    assert cache.get(image_hash, "care_guide:v2", colors) is None
+    assert cache.stats()["layers"]["care_guide:v2"] == {"hits": 0, "misses": 1, "hitRate": 0.0}
+
+
+def test_least_recently_used_image_is_evicted(cache):
+    keys = [key(photo(seed)) for seed in range(4)]
+    for i, (image_hash, colors) in enumerate(keys[:3]):
+        cache.put(image_hash, "care_guide", i, colors)
+    cache.get(keys[0][0], "care_guide", keys[0][1])
+
+    cache.put(keys[3][0], "care_guide", 3, keys[3][1])
+
+    assert [cache.get(h, "care_guide", c) for h, c in keys] == [0, None, 2, 3]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_flush_round_trips_colors_and_drops_colorless_matches(tmp_path):
+    path = tmp_path / "image_cache.json"
+    white, black = key(solid((255, 255, 255))), key(solid((30, 30, 30)))
+    # Written before entries had colours: cannot be told apart from any other flat image
+    path.write_text(json.dumps({"entries": [{"hash": "0000000000000000", "layers": {"care_guide": "old"}}]}))
+
+    cache = PerceptualImageCache(path=str(path), flush_interval=60)
+    assert cache.get(white[0], "care_guide", white[1]) is None
+    cache.put(black[0], "care_guide", "black", black[1])
+    cache.flush()
+
+    reloaded = PerceptualImageCache(path=str(path), flush_interval=60)
+    assert reloaded.get(black[0], "care_guide", black[1]) == "black"
+    assert reloaded.get(white[0], "care_guide", white[1]) is None
+    assert json.loads(path.read_text())["entries"] == [
+        {"hash": "0000000000000000", "layers": {"care_guide": "black"}, "colors": black[1]},
+    ]
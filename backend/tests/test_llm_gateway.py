@@ -0,0 +1,182 @@
+"""LLMGateway coalescing, concurrency limit, load shedding and deadlines, against an in-process fake model."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import pytest
+from llm_gateway import LLMGateway, LLMOverloadedError, LLMTimeoutError
+
+
+class FakeModel:
+    """Runnable answering after ``latency`` seconds; counts calls and the most open at once."""
+
+    def __init__(self, latency=0.05, token_delay=0.0, error=None):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error = error
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def _leave(self):
+        with self._lock:
+            self.active -= 1
+
+    def invoke(self, input):
+        self._enter()
+        try:
+            time.sleep(self.latency)
+            if self.error:
+                raise self.error
+            return SimpleNamespace(content=f"answer to {input}")
+        finally:
+            self._leave()
+
+    def stream(self, input):
+        self._enter()
+        try:
+            time.sleep(self.latency)
+            for word in f"answer to {input}".split(" "):
+                time.sleep(self.token_delay)
+                yield SimpleNamespace(content=word + " ")
+        finally:
+            self._leave()
+
+
+def burst(gateway, model, prompts):
+    """Send every prompt at once; ``(outcome, seconds)`` per prompt."""
+    def call(prompt):
+        start = time.perf_counter()
+        try:
+            gateway.invoke(model, prompt, "test")
+            outcome = "ok"
+        except LLMOverloadedError:
+            outcome = "shed"
+        except LLMTimeoutError:
+            outcome = "timeout"
+        except RuntimeError:
+            outcome = "error"
+        return outcome, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        return list(pool.map(call, prompts))
+
+
+def wait_idle(gateway, model, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = gateway.stats()
+        if model.active == 0 and stats["running"] == 0 and stats["waiting"] == 0:
+            return stats
+        time.sleep(0.01)
+    return gateway.stats()
+
+
+def test_identical_calls_share_one_provider_call():
+    model = FakeModel(latency=0.2)
+    results = burst(LLMGateway(max_concurrency=4, max_queue=8), model, ["Suggest a sofa"] * 20)
+
+    assert [outcome for outcome, _ in results] == ["ok"] * 20
+    assert model.calls == 1
+
+
+def test_coalesced_callers_all_get_the_error():
+    model = FakeModel(latency=0.1, error=RuntimeError("provider down"))
+    gateway = LLMGateway(max_concurrency=4, max_queue=8)
+
+    results = burst(gateway, model, ["Suggest a sofa"] * 5)
+
+    assert [outcome for outcome, _ in results] == ["error"] * 5
+    assert model.calls == 1
+    assert gateway.stats()["coalescing"] == 0
+
+
+def test_no_more_than_max_concurrency_calls_are_open():
+    model = FakeModel(latency=0.1)
+    results = burst(LLMGateway(max_concurrency=3, max_queue=20), model, [f"Suggest shelf {i}" for i in range(12)])
+
+    assert [outcome for outcome, _ in results] == ["ok"] * 12
+    assert model.calls == 12
+    assert model.max_active == 3
+
+
+def test_calls_past_the_queue_are_shed_at_once():
+    model = FakeModel(latency=0.3)
+    gateway = LLMGateway(max_concurrency=2, max_queue=3)
+
+    results = burst(gateway, model, [f"Suggest lamp {i}" for i in range(15)])
+
+    shed = [seconds for outcome, seconds in results if outcome == "shed"]
+    answered = sum(outcome == "ok" for outcome, _ in results)
+    assert answered >= 5
+    assert shed and max(shed) < 0.05
+    assert model.max_active <= 2
+    assert LLMOverloadedError.status == 503
+    assert wait_idle(gateway, model)["waiting"] == 0
+
+
+def test_deadline_covers_a_running_call_and_frees_its_slot_after():
+    model = FakeModel(latency=0.5)
+    gateway = LLMGateway(max_concurrency=2, max_queue=2, timeout=0.1)
+
+    start = time.perf_counter()
+    with pytest.raises(LLMTimeoutError) as excinfo:
+        gateway.invoke(model, "Suggest a slow desk", "test")
+    assert time.perf_counter() - start < 0.3
+    assert excinfo.value.status == 504
+
+    stats = wait_idle(gateway, model)
+    assert (stats["running"], stats["waiting"], stats["coalescing"]) == (0, 0, 0)
+
+
+def test_queued_call_past_its_deadline_never_reaches_the_model():
+    model = FakeModel(latency=0.3)
+    gateway = LLMGateway(max_concurrency=1, max_queue=4)
+    blocker = threading.Thread(target=gateway.invoke, args=(model, "Suggest a bed", "test"))
+    blocker.start()
+    time.sleep(0.05)
+
+    with pytest.raises(LLMTimeoutError):
+        gateway.invoke(model, "Suggest a wardrobe", "test", timeout=0.1)
+    blocker.join()
+
+    assert model.calls == 1
+    assert gateway.stats()["waiting"] == 0
+
+
+def test_stream_yields_every_chunk_and_releases_its_slot():
+    model = FakeModel(latency=0.01, token_delay=0.01)
+    gateway = LLMGateway(max_concurrency=1, max_queue=0)
+
+    streamed = "".join(chunk.content for chunk in gateway.stream(model, "Suggest a bookcase", "test"))
+
+    assert streamed == "answer to Suggest a bookcase "
+    assert wait_idle(gateway, model)["running"] == 0
+    gateway.invoke(model, "Suggest a chair", "test")
+
+
+def test_stream_stopped_early_releases_its_slot():
+    model = FakeModel(latency=0.01, token_delay=0.05)
+    gateway = LLMGateway(max_concurrency=1, max_queue=0)
+
+    chunks = gateway.stream(model, "Suggest a long answer", "test")
+    next(chunks)
+    chunks.close()
+
+    assert wait_idle(gateway, model)["running"] == 0
+
+
+def test_stalled_stream_times_out():
+    model = FakeModel(latency=0.5)
+    gateway = LLMGateway(max_concurrency=1, max_queue=0, timeout=0.1)
+
+    with pytest.raises(LLMTimeoutError):
+        list(gateway.stream(model, "Suggest a slow lamp", "test"))
+    assert wait_idle(gateway, model)["running"] == 0
@@ -0,0 +1,60 @@
+"""LLMGateway driving a real ChatGroq client against the local fake Groq server."""
+import pytest
+from benchmarks.fake_llm import FakeLLMServer, canned_response
+from llm_gateway import LLMGateway, LLMTimeoutError
+from test_llm_gateway import burst
+
+langchain_groq = pytest.importorskip("langchain_groq")
+
+
+@pytest.fixture
+def server():
+    server = FakeLLMServer(port=0, latency=0.2, token_delay=0.005).start()
+    yield server
+    server.stop()
+
+
+def chat_model(server, timeout=10):
+    return langchain_groq.ChatGroq(groq_api_key="fake", base_url=server.url, model_name="fake-model",
+                                   max_retries=0, request_timeout=timeout)
+
+
+def answer(prompt):
+    return canned_response([{"content": prompt}])
+
+
+def test_identical_prompts_make_one_http_request(server):
+    gateway = LLMGateway(max_concurrency=4, max_queue=8)
+
+    results = burst(gateway, chat_model(server), ["Suggest a sofa"] * 10)
+
+    assert [outcome for outcome, _ in results] == ["ok"] * 10
+    assert server.stats()["requests"] == 1
+    assert gateway.invoke(chat_model(server), "Suggest a sofa", "test").content == answer("Suggest a sofa")
+
+
+def test_open_requests_stay_under_max_concurrency(server):
+    results = burst(LLMGateway(max_concurrency=2, max_queue=10), chat_model(server),
+                    [f"Suggest shelf {i}" for i in range(6)])
+
+    assert [outcome for outcome, _ in results] == ["ok"] * 6
+    assert server.stats()["requests"] == 6
+    assert server.stats()["maxActive"] == 2
+
+
+def test_stream_returns_the_whole_completion(server):
+    gateway = LLMGateway(max_concurrency=1, max_queue=0)
+
+    streamed = "".join(chunk.content for chunk in gateway.stream(chat_model(server), "Suggest a bed", "test"))
+
+    assert streamed == answer("Suggest a bed")
+    # max_queue=0: this is shed if the stream kept its slot
+    gateway.invoke(chat_model(server), "Suggest a chair", "test")
+
+
+def test_slow_server_hits_the_gateway_deadline(server):
+    server.latency = 0.5
+    gateway = LLMGateway(max_concurrency=1, max_queue=0, timeout=0.1)
+
+    with pytest.raises(LLMTimeoutError):
+        gateway.invoke(chat_model(server), "Suggest a slow desk", "test")
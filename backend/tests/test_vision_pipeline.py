@@ -0,0 +1,140 @@
+"""One Vision request per image: annotation parsing, and both image endpoints against fake Vision and Groq."""
+import base64
+import io
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from benchmarks.fake_vision import FakeVisionClient
+from vision_pipeline import CARE_GUIDE_FEATURES, MOODBOARD_FEATURES, annotate
+
+
+class CountingVisionClient(FakeVisionClient):
+    """FakeVisionClient that records every request it is sent."""
+
+    def __init__(self):
+        super().__init__(latency=0)
+        self.requests = []
+
+    def annotate_image(self, request):
+        self.requests.append(request)
+        return super().annotate_image(request)
+
+
+def photo(seed, size=(320, 240)):
+    """A noisy JPEG, so every seed gets a distinct perceptual hash."""
+    pixels = np.random.default_rng(seed).integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, format="JPEG")
+    return out.getvalue()
+
+
+def test_annotate_asks_for_every_feature_in_one_request():
+    client = CountingVisionClient()
+
+    annotate(client, b"image bytes", MOODBOARD_FEATURES)
+
+    assert client.requests == [{
+        "image": {"content": b"image bytes"},
+        "features": [{"type_": "LABEL_DETECTION"}, {"type_": "IMAGE_PROPERTIES"}],
+    }]
+
+
+def test_annotate_reads_labels_objects_and_colors():
+    response = FakeVisionClient(latency=0).annotate_image({"image": {"content": b"image bytes"}})
+
+    features = ("LABEL_DETECTION", "OBJECT_LOCALIZATION", "IMAGE_PROPERTIES")
+    annotations = annotate(CountingVisionClient(), b"image bytes", features)
+
+    assert annotations["labels"] == [label.description for label in response.label_annotations]
+    assert annotations["objects"] == [obj.name for obj in response.localized_object_annotations]
+    assert annotations["colors"] == [
+        {"red": c.color.red, "green": c.color.green, "blue": c.color.blue, "score": c.score}
+        for c in response.image_properties_annotation.dominant_colors.colors
+    ]
+
+
+def test_colors_are_only_read_when_requested():
+    annotations = annotate(CountingVisionClient(), b"image bytes", CARE_GUIDE_FEATURES)
+
+    assert annotations["labels"] and annotations["objects"]
+    assert annotations["colors"] == []
+
+
+def test_vision_error_is_raised():
+    class FailingClient(CountingVisionClient):
+        def annotate_image(self, request):
+            response = super().annotate_image(request)
+            response.error.message = "quota exceeded"
+            return response
+
+    with pytest.raises(RuntimeError, match="quota exceeded"):
+        annotate(FailingClient(), b"image bytes", CARE_GUIDE_FEATURES)
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    """main's Flask app, using a fake Groq server, a counting Vision client and a fresh image cache."""
+    pytest.importorskip("langchain_groq")
+    pytest.importorskip("langchain_core")
+    from benchmarks.fake_llm import FakeLLMServer
+
+    llm = FakeLLMServer(latency=0, token_delay=0).start()
+    os.environ.update({
+        "GROQ_API_BASE": llm.url,
+        "GROQ_API_KEY": "fake",
+        "IMAGE_CACHE_PATH": str(tmp_path_factory.mktemp("image_cache") / "image_cache.json"),
+        "SESSION_BACKEND": "memory",
+    })
+    import main
+    import vision_pipeline
+
+    vision = CountingVisionClient()
+    vision_pipeline.set_vision_client(vision)
+    yield main.app.test_client(), vision, llm
+    llm.stop()
+
+
+def stages(response):
+    return [entry.split(";")[0] for entry in response.headers.get("Server-Timing", "").split(", ")]
+
+
+def test_care_guide_makes_one_vision_call_and_is_cached(app):
+    client, vision, llm = app
+    vision.requests.clear()
+    llm.reset()
+    body = {"image": base64.b64encode(photo(1)).decode()}
+
+    first = client.post("/api/analyze-furniture", json=body)
+    again = client.post("/api/analyze-furniture", json=body)
+
+    assert first.status_code == 200
+    assert set(first.get_json()) == {"materials", "cleaningTips", "maintenanceSchedule"}
+    assert [r["features"] for r in vision.requests] == [[{"type_": f} for f in CARE_GUIDE_FEATURES]]
+    assert stages(first) == ["ingest", "hash", "vision", "llm"]
+    assert again.get_json() == first.get_json()
+    assert stages(again) == ["ingest", "hash"]
+    assert llm.stats()["requests"] == 1
+
+
+def test_moodboard_makes_one_vision_call(app):
+    client, vision, llm = app
+    vision.requests.clear()
+
+    response = client.post("/api/analyze-moodboard", data={"image": (io.BytesIO(photo(2)), "room.jpg")},
+                           content_type="multipart/form-data")
+
+    assert response.status_code == 200
+    assert response.get_json()["vibe"]
+    assert response.get_json()["recommendations"]
+    assert [r["features"] for r in vision.requests] == [[{"type_": f} for f in MOODBOARD_FEATURES]]
+    assert stages(response) == ["ingest", "hash", "vision", "llm"]
+
+
+def test_missing_images_are_rejected(app):
+    client, vision, _ = app
+    vision.requests.clear()
+
+    assert client.post("/api/analyze-furniture", json={}).status_code == 400
+    assert client.post("/api/analyze-moodboard", data={}, content_type="multipart/form-data").status_code == 400
+    assert vision.requests == []
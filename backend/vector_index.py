@@ -0,0 +1,156 @@
+import os
+import numpy as np
+
+# Rows converted to float32 at a time while scoring (16k x 384 dims is ~25 MB)
+BLOCK_ROWS = int(os.getenv("VECTOR_BLOCK_ROWS", "16384"))
+
+
+def normalize_rows(vectors):
+    """L2-normalize each row so a dot product is a cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def ids_path(path):
+    """Sidecar holding the row ids and description hashes for the matrix at ``path``."""
+    base = path[:-4] if path.endswith(".npy") else path
+    return f"{base}.ids.npz"
+
+
+def _replace_atomically(path, write):
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class CatalogVectorIndex:
+    """Catalog embeddings held as one matrix, keyed by catalog row id.
+
+    The matrix is built once and stored as float16 ``.npy`` so startup can
+    memory-map it; a chat turn only embeds the query and runs a top-k over
+    the rows allowed by the SQL filter. ``hashes`` fingerprints the text each
+    row was embedded from so the builder can skip unchanged rows.
+    """
+
+    def __init__(self, ids, vectors, hashes=None):
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) != len(vectors):
+            raise ValueError(f"{len(ids)} ids for {len(vectors)} vectors")
+        if np.all(ids[:-1] <= ids[1:]):
+            # Already sorted: keep memory-mapped vectors mapped
+            self.ids, self.vectors, self.hashes = ids, vectors, hashes
+        else:
+            order = np.argsort(ids, kind="stable")
+            self.ids = ids[order]
+            self.vectors = np.asarray(vectors)[order]
+            self.hashes = None if hashes is None else np.asarray(hashes)[order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dimension(self):
+        return self.vectors.shape[1]
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        vectors = np.load(path, mmap_mode="r" if mmap else None)
+        with np.load(ids_path(path)) as sidecar:
+            return cls(sidecar["ids"], vectors, sidecar["hashes"])
+
+    def save(self, path):
+        """Write the matrix as float16 ``.npy`` plus its id/hash sidecar."""
+        hashes = self.hashes if self.hashes is not None else np.zeros(len(self.ids), dtype="S16")
+
+        def write_vectors(tmp_path):
+            out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float16, shape=self.vectors.shape)
+            out[:] = self.vectors
+            out.flush()
+            del out
+
+        def write_sidecar(tmp_path):
+            with open(tmp_path, "wb") as f:
+                np.savez(f, ids=self.ids, hashes=hashes)
+
+        _replace_atomically(path, write_vectors)
+        _replace_atomically(ids_path(path), write_sidecar)
+
+    def lookup(self, row_ids):
+        """Matrix position of each row id, or -1 where the id is not in the matrix."""
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        if len(self.ids) == 0:
+            return np.full(len(row_ids), -1, dtype=np.int64)
+        pos = np.clip(np.searchsorted(self.ids, row_ids), 0, len(self.ids) - 1)
+        return np.where(self.ids[pos] == row_ids, pos, -1)
+
+    def matches(self, row_ids, hashes):
+        """True when the matrix holds exactly these rows embedded from these texts."""
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        order = np.argsort(row_ids, kind="stable")
+        return (
+            self.hashes is not None
+            and np.array_equal(self.ids, row_ids[order])
+            and np.array_equal(self.hashes, np.asarray(hashes)[order])
+        )
+
+    def positions(self, row_ids):
+        """Matrix positions of the given row ids; unknown ids are dropped."""
+        pos = self.lookup(np.unique(np.asarray(list(row_ids), dtype=np.int64)))
+        return pos[pos >= 0]
+
+    def search(self, query_vector, k=5, row_ids=None):
+        """Top-k ``(row_id, score)`` pairs, restricted to ``row_ids`` when given."""
+        candidates = None if row_ids is None else self.positions(row_ids)
+        return self._top_k(normalize_rows(query_vector)[:1], k, candidates)[0]
+
+    def search_many(self, query_vectors, k=5, block_rows=BLOCK_ROWS):
+        """Unfiltered top-k ``(row_id, score)`` lists for a batch of queries.
+
+        The matrix is read once for the whole batch, scoring each block of
+        rows against every query in one matrix product.
+        """
+        return self._top_k(normalize_rows(query_vectors), k, block_rows=block_rows)
+
+    def _top_k(self, queries, k, candidates=None, block_rows=BLOCK_ROWS):
+        """Top-k lists per query over ``candidates`` (matrix positions, all rows when None).
+
+        Rows are converted to float32 ``block_rows`` at a time and a running
+        top-k is kept per query, so neither a float32 copy of the matrix nor
+        a queries x rows score matrix is ever held.
+        """
+        total = len(self.ids) if candidates is None else len(candidates)
+        k = min(k, total)
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_positions = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, total, block_rows):
+            if candidates is None:
+                block_positions = np.arange(start, min(start + block_rows, total))
+                block = np.asarray(self.vectors[start:start + block_rows], dtype=np.float32)
+            else:
+                block_positions = candidates[start:start + block_rows]
+                block = self.vectors[block_positions].astype(np.float32)
+            scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+            positions = np.concatenate([
+                best_positions,
+                np.broadcast_to(block_positions, (len(queries), len(block_positions))),
+            ], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                positions = np.take_along_axis(positions, top, axis=1)
+            best_scores, best_positions = scores, positions
+
+        # Equal scores (duplicate descriptions) rank by matrix position, whatever the block size
+        order = np.lexsort((best_positions, -best_scores), axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_positions = np.take_along_axis(best_positions, order, axis=1)
+        return [
+            [(int(self.ids[p]), float(s)) for p, s in zip(positions, scores)]
+            for positions, scores in zip(best_positions, best_scores)
+        ]
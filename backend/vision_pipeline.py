@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+
+# Everything each endpoint needs, requested in one annotate call; Feature.Type names
+CARE_GUIDE_FEATURES = ("LABEL_DETECTION", "OBJECT_LOCALIZATION")
+MOODBOARD_FEATURES = ("LABEL_DETECTION", "IMAGE_PROPERTIES")
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_vision_client():
+    """This process's ``vision.ImageAnnotatorClient``, created on first use.
+
+    ``google.cloud.vision`` is slow to import and its gRPC channel must not
+    cross a fork, so the import is deferred and each worker opens its own.
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            from google.cloud import vision
+            _client = vision.ImageAnnotatorClient()
+            _client_pid = os.getpid()
+        return _client
+
+
+def set_vision_client(client):
+    """Use ``client`` in this process instead of a real Vision client, e.g. a benchmark stand-in."""
+    global _client, _client_pid
+    with _client_lock:
+        _client = client
+        _client_pid = os.getpid()
+
+
+def annotate(client, content, features):
+    """Run all ``features`` on the image in a single Vision request.
+
+    ``client`` only needs an ``annotate_image(request)`` method, so a local
+    stand-in can replace ``vision.ImageAnnotatorClient`` in benchmarks.
+    ``features`` are ``vision.Feature.Type`` names. Returns the labels,
+    localized object names and dominant colors found.
+    """
+    response = client.annotate_image({
+        "image": {"content": content},
+        "features": [{"type_": feature} for feature in features],
+    })
+    if response.error.message:
+        raise RuntimeError(response.error.message)
+
+    colors = []
+    if "IMAGE_PROPERTIES" in features:
+        for color in response.image_properties_annotation.dominant_colors.colors:
+            colors.append({
+                'red': color.color.red,
+                'green': color.color.green,
+                'blue': color.color.blue,
+                'score': color.score
+            })
+
+    return {
+        'labels': [label.description for label in response.label_annotations],
+        'objects': [obj.name for obj in response.localized_object_annotations],
+        'colors': colors,
+    }
+
+
+def care_guide_prompt(furniture_context):
+    return f"""Based on the following furniture context: {furniture_context}
+
+Please provide a concise care guide with the following sections (keep each section to 1-2 sentences):
+
+1. Materials: Briefly identify the main materials
+2. Cleaning Tips: Provide 1-2 key cleaning instructions
+3. Maintenance Schedule: List 2-3 main maintenance tasks
+
+IMPORTANT: Your response MUST be a valid JSON object with EXACTLY these keys:
+{{
+    "materials": "brief materials description",
+    "cleaningTips": "1-2 key cleaning tips",
+    "maintenanceSchedule": "2-3 main maintenance tasks"
+}}
+
+Keep responses short and to the point. Do not include any additional text or formatting outside the JSON object."""
+
+
+def moodboard_prompt(labels, colors):
+    return f"""
+            Based on the following image analysis:
+            - Labels: {', '.join(labels)}
+            - Dominant colors: {json.dumps(colors)}
+
+            Please provide:
+            1. A brief description of the room's vibe and style
+            2. 3-5 furniture categories that would complement this space.
+               IMPORTANT: Use ONLY these exact categories from our database:
+               - Bar furniture
+               - Beds
+               - Bookcases & shelving units
+               - Cabinets & cupboards
+               - Café furniture
+
+            Format the response as a JSON object with the following structure:
+            {{
+                "vibe": "description of the room's vibe",
+                "categories": ["category1", "category2", "category3"]
+            }}
+            """
@@ -0,0 +1,9 @@
+"""Production entry point: ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+Importing this module loads the encoder, catalog and indexes. With
+``preload_app`` (the default in gunicorn.conf.py) that happens once in the
+master, and the forked workers share those pages copy-on-write.
+"""
+from main import app
+
+__all__ = ["app"]
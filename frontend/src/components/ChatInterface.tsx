@@ -374,8 +374,10 @@ const ChatInterface: React.FC = () => {
         setInput('');
         setIsLoading(true);
 
+        const chatId = activeChatId;
+        let hasPlaceholder = false;
         try {
-            const response = await fetch(`${API_URL}/api/chat`, {
+            const response = await fetch(`${API_URL}/api/chat/stream`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -386,34 +388,75 @@ const ChatInterface: React.FC = () => {
                 }),
             });
 
-            const data = await response.json();
+            if (!response.ok || !response.body) {
+                throw new Error(`Chat request failed with status ${response.status}`);
+            }
 
-            const assistantMessage: Message = {
-                role: 'assistant',
-                content: formatMessage(data.response),
+            // Show an empty assistant message and fill it in as tokens arrive
+            const updateAssistantMessage = (content: string) => {
+                setChats(prev => prev.map(chat => {
+                    if (chat.id !== chatId) return chat;
+                    const messages = [...chat.messages];
+                    messages[messages.length - 1] = { role: 'assistant', content: formatMessage(content) };
+                    return { ...chat, messages };
+                }));
             };
-
             setChats(prev => prev.map(chat =>
-                chat.id === activeChatId
-                    ? { ...chat, messages: [...chat.messages, assistantMessage] }
+                chat.id === chatId
+                    ? { ...chat, messages: [...chat.messages, { role: 'assistant', content: '' }] }
                     : chat
             ));
+            hasPlaceholder = true;
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let answer = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                // Server-Sent Events are separated by a blank line
+                const events = buffer.split('\n\n');
+                buffer = events.pop() || '';
+                for (const rawEvent of events) {
+                    const eventLine = rawEvent.split('\n').find(line => line.startsWith('event: '));
+                    const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+                    if (!eventLine || !dataLine) continue;
+                    const event = eventLine.slice('event: '.length);
+                    const data = JSON.parse(dataLine.slice('data: '.length));
+                    if (event === 'token') {
+                        answer += data.text;
+                        updateAssistantMessage(answer);
+                    } else if (event === 'done') {
+                        answer = data.response;
+                        updateAssistantMessage(answer);
+                    } else if (event === 'error') {
+                        throw new Error(data.error);
+                    }
+                }
+            }
+
+            const assistantMessage: Message = {
+                role: 'assistant',
+                content: formatMessage(answer),
+            };
 
             // Speak the assistant's response
             speakText(assistantMessage.content);
         } catch (error) {
             console.error('Error:', error);
-            setChats(prev => prev.map(chat =>
-                chat.id === activeChatId
-                    ? {
-                        ...chat,
-                        messages: [...chat.messages, {
-                            role: 'assistant',
-                            content: 'Sorry, there was an error processing your request. Please try again.',
-                        }]
-                    }
-                    : chat
-            ));
+            const errorMessage: Message = {
+                role: 'assistant',
+                content: 'Sorry, there was an error processing your request. Please try again.',
+            };
+            // A stream that fails part-way replaces its partial answer rather than leaving it above the error
+            setChats(prev => prev.map(chat => {
+                if (chat.id !== chatId) return chat;
+                const messages = hasPlaceholder ? chat.messages.slice(0, -1) : chat.messages;
+                return { ...chat, messages: [...messages, errorMessage] };
+            }));
         } finally {
             setIsLoading(false);
         }